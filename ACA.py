@@ -0,0 +1,286 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+
+import warnings
+import numpy as np
+import matplotlib.pyplot as plt
+from BCAnalysis import BCAnalysis
+from StreamBuffer import StreamBuffer
+
+# p - pi = SOLIMAN_RADIAL * V.mu / (kh.t) during pseudo-radial flow, with V [bbl], mu [cp], k [md], h [ft] and t [hrs]
+SOLIMAN_RADIAL = 1694.4
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class ACA:
+    """After Closure Analysis (Soliman). Plots log-log of p and t.dp/dt vs total time, identifies the pseudo-linear and
+    pseudo-radial flow regimes after closure and estimates the reservoir pressure and transmissibility."""
+
+    arrays = ('T', 'tdp', 'slope')
+    picks = ('dwindow', 'window', 'tClosure', 'volume', 'khmu', 'pReservoir',
+             'radialStart', 'radialEnd', 'linearStart', 'linearEnd')
+    regimes = (('radial', -1.0), ('linear', -0.5))  # Flow regimes and their slope of log(t.dp/dt) vs log(t)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self):
+        """Constructor instantiates the variables to be used"""
+
+        self.fig = None  # Figure of the analysis
+        self.yaxis1 = None  # Handle for pressure y-axis for the figure
+        self.yaxis2 = None  # Handle for t.dp/dt y-axis for the figure
+        self.T = None  # Total time since the start of injection in hours
+        self.tdp = None  # Log derivative of pressure = |t.dp/dt| = |dp/dln(t)| in psi
+        self.slope = None  # Slope of log(t.dp/dt) vs log(t), -1 in pseudo-radial and -1/2 in pseudo-linear flow
+        self.dwindow = None  # Smoothing window of the derivatives in natural log of time, either side
+        self.window = 'log'  # Units of dwindow, only natural log of time is supported
+        self.tClosure = None  # Closure time (hours after s/i) from which flow regimes are searched
+        self.volume = None  # Injected volume in bbl
+        self.khmu = None  # Transmissibility kh/mu in md.ft/cp from pseudo-radial flow
+        self.pReservoir = None  # Reservoir pressure in psi from pseudo-radial (or else pseudo-linear) flow
+        self.radialStart = None  # Start and end of pseudo-radial flow in hours after s/i
+        self.radialEnd = None
+        self.linearStart = None  # Start and end of pseudo-linear flow in hours after s/i
+        self.linearEnd = None
+        self.buffers = None  # Growable storage of the computed arrays and log of time, created on the first update
+        self.defined = None  # First and last index where t.dp/dt is defined, tracked by the updates
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def analysis(self, well, dwindow):
+        """Computes total time, t.dp/dt and the log-log slope of t.dp/dt from the shut-in data. Both derivatives are
+        least square slopes over the points within dwindow either side in natural log of time (e.g. 0.1), so the
+        smoothing does not depend on the sampling. Both are stages of the profiler of the well. Returns total time
+        [hrs], t.dp/dt and slope."""
+
+        self.dwindow = dwindow
+        self.buffers = self.defined = None
+        T = well.tp * (1 + np.asarray(well.tD, dtype=float))  # Total time in seconds
+        lnT = np.log(T)
+        with well.profiler.stage('ACA.derivative', p_shut=np.size(well.p_shut)):
+            self.tdp = BCAnalysis.windowedDerivative(lnT, well.p_shut, lnT, dwindow)
+        with well.profiler.stage('ACA.slope', tdp=np.size(self.tdp)):
+            self.slope = self.tdpSlopes(lnT)
+        self.T = T / 3600
+        return self.T, self.tdp, self.slope
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def update(self, well):
+        """Extends total time, t.dp/dt and slope to the samples appended to the well, only the derivative windows
+        touched by the new samples are recomputed"""
+
+        nOld = np.shape(self.T)[0]
+        if self.buffers is None:
+            lnT = np.log(well.tp * (1 + np.asarray(well.tD[:nOld], dtype=float)))
+            self.buffers = StreamBuffer(self.T), StreamBuffer(self.tdp), StreamBuffer(self.slope), StreamBuffer(lnT)
+            defined = np.flatnonzero(self.tdp > 0)
+            self.defined = (defined[0], defined[-1]) if defined.size else None
+        T = well.tp * (1 + np.asarray(well.tD[nOld:], dtype=float))
+        lnT = self.buffers[3].append(np.log(T))
+        self.T = self.buffers[0].append(T / 3600)
+        self.tdp = self.buffers[1].append(np.zeros_like(T))
+        self.slope = self.buffers[2].append(np.zeros_like(T))
+
+        d = self.dwindow
+        start = np.searchsorted(lnT, lnT[nOld - 1] - d, side='left')
+        self.tdp[start:] = BCAnalysis.windowedDerivative(lnT, well.p_shut, lnT, d, start)
+
+        # The slopes up to a window before the last defined point change with the new data, as its window reached
+        # beyond the data
+        first = start if self.defined is None else min(start, self.defined[1])
+        first = np.searchsorted(lnT, lnT[first] - d, side='left')
+        defined = start + np.flatnonzero(self.tdp[start:] > 0)
+        if defined.size:
+            kept = self.defined is not None and self.defined[0] < start  # Defined before the recomputed points
+            self.defined = (self.defined[0] if kept else defined[0], defined[-1])
+        elif self.defined is not None and self.defined[1] >= start:
+            defined = np.flatnonzero(self.tdp[:start] > 0)  # Rare, the last defined points are no longer defined
+            self.defined = (defined[0], defined[-1]) if defined.size else None
+        self.slope[first:] = self.tdpSlopes(lnT, first, None if self.defined is None else lnT[self.defined[0]])
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def tdpSlopes(self, lnT, start=0, lower=None):
+        """Slope of log(t.dp/dt) vs log(t) over the points where t.dp/dt is defined, from point start onwards. From a
+        later start only the points within a window of it are used, with lower the log of time of the first point
+        where t.dp/dt is defined."""
+
+        reach = np.searchsorted(lnT, lnT[start] - self.dwindow, side='left') if start else 0
+        defined = reach + np.flatnonzero(self.tdp[reach:] > 0)
+        slope = np.zeros(np.shape(lnT)[0] - start)
+        if np.shape(defined)[0] > 2:
+            k = np.searchsorted(defined, start)
+            slope[defined[k:] - start] = self.logSlopes(lnT[defined], np.log(self.tdp[defined]), self.dwindow, k,
+                                                        lower)
+        return slope
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def logSlopes(X, Y, halfwidth, start=0, lower=None):
+        """Signed least square slopes of Y vs X (sorted ascending) over the points within +/- halfwidth of each point,
+        zero where the window reaches beyond the data. Only the points from start onwards are computed and returned.
+        X may be a tail of the data reaching a window below start, with lower the first X of the whole data."""
+
+        x = X[start:]
+        lo = np.searchsorted(X, x - halfwidth, side='left')
+        hi = np.searchsorted(X, x + halfwidth, side='right')
+        b = BCAnalysis.rangeSlopes(X, Y, lo, hi)
+        valid = (x - halfwidth >= (X[0] if lower is None else lower)) & (x + halfwidth <= X[-1]) & (hi - lo >= 3) & \
+            ~np.isnan(b)
+        return np.where(valid, b, 0)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def injectedVolume(well):
+        """Injected volume in bbl from the rate (bpm) integrated over the injection. Raises ValueError if the injection
+        was not loaded (e.g. chunked loads keep the data from shut-in only)."""
+
+        if well.tp_row == 0:
+            raise ValueError('No injection data loaded to integrate the injected volume, give the volume in bbl')
+        t = well.t[:well.tp_row + 1]
+        r = well.r[:well.tp_row + 1]
+        return float(np.sum(0.5 * (r[1:] + r[:-1]) * np.diff(t))) / 60
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def longestRun(mask):
+        """Start and end (exclusive) indices of the longest run of True in mask, None if there is none"""
+
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+        if edges.size == 0:
+            return None
+        starts, ends = edges[::2], edges[1::2]
+        longest = np.argmax(ends - starts)
+        return starts[longest], ends[longest]
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def identifyRegimes(self, well, tClosure=None, volume=None, tolerance=0.15, verbose=True):
+        """Finds the longest stretches after closure (tClosure hours after s/i, e.g. from the G-function analysis)
+        where the slope of t.dp/dt is -1 +/- tolerance (pseudo-radial) and -1/2 +/- tolerance (pseudo-linear). The
+        search starts once the derivative windows (2 dwindow in log of time) are clear of closure. From pseudo-radial
+        flow, p - pi = t.dp/dt and kh/mu = 1694.4 V / (t^2 |dp/dt|) [Soliman], with the injected volume V integrated
+        from the rate unless given in bbl (required for chunked loads). Without pseudo-radial flow the reservoir
+        pressure is estimated from pseudo-linear flow as p - 2 t.dp/dt. Non-physical estimates, not positive, above the
+        falloff pressure or more than tolerance below the pressure before injection, are rejected with a warning.
+        Prints the results to console if verbose."""
+
+        self.tClosure = 0 if tClosure is None else tClosure
+        self.volume = self.injectedVolume(well) if volume is None else volume
+        tShut = self.T - well.tp / 3600  # Hours after s/i
+        clear = self.T >= (self.tClosure + well.tp / 3600) * np.exp(2 * self.dwindow)
+        after = clear & (self.tdp > 0)
+        pBefore = well.p[0] if well.tp_row > 0 else None  # Pressure before injection, unknown for chunked loads
+
+        self.khmu = self.pReservoir = None
+        p = {}  # Reservoir pressure estimates per regime
+        for name, target in self.regimes:
+            run = self.longestRun(after & (np.abs(self.slope - target) <= tolerance))
+            if run is None or run[1] - run[0] < 3:
+                setattr(self, name + 'Start', None)
+                setattr(self, name + 'End', None)
+                continue
+            lo, hi = run
+            setattr(self, name + 'Start', float(tShut[lo]))
+            setattr(self, name + 'End', float(tShut[hi - 1]))
+            estimate = float(np.median(well.p_shut[lo:hi] + self.tdp[lo:hi] / target))
+            if not 0 < estimate < well.p_shut[hi - 1] or pBefore is not None and estimate < (1 - tolerance) * pBefore:
+                warnings.warn('Pseudo-{} flow gives a non-physical reservoir pressure of {:.1f} psi, ignored'.format(
+                    name, estimate))
+                continue
+            p[name] = estimate
+            if name == 'radial':
+                self.khmu = float(SOLIMAN_RADIAL * self.volume / np.median(self.T[lo:hi] * self.tdp[lo:hi]))
+        self.pReservoir = p.get('radial', p.get('linear'))
+
+        if verbose:
+            print('After Closure Analysis Results')
+            for name, _ in self.regimes:
+                start = getattr(self, name + 'Start')
+                if start is None:
+                    print('No pseudo-{} flow identified'.format(name))
+                else:
+                    print('Pseudo-{} flow from {:.2f} to {:.2f} hrs after s/i'.format(
+                        name, start, getattr(self, name + 'End')))
+            if self.pReservoir is not None:
+                print('Reservoir Pressure = {pi:.1f} psi '.format(pi=self.pReservoir))
+            if self.khmu is not None:
+                print('kh/mu = {khmu:.4g} md.ft/cp (V = {v:.1f} bbl)'.format(khmu=self.khmu, v=self.volume))
+        return self.pReservoir, self.khmu
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def permeability(self, h, mu):
+        """Permeability in md from kh/mu for a net height h [ft] and viscosity mu [cp]"""
+
+        if self.khmu is None:
+            raise ValueError('No pseudo-radial flow identified, kh/mu is unknown')
+        return self.khmu * mu / h
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def getState(self):
+        """Returns the computed arrays and results (if any) as a dict of arrays, e.g. for saving"""
+
+        state = {name: np.asarray(getattr(self, name)) for name in self.arrays}
+        state.update({name: np.asarray(getattr(self, name)) for name in self.picks if getattr(self, name) is not None})
+        return state
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def setState(self, state):
+        """Restores the arrays and results returned by getState"""
+
+        for name, value in state.items():
+            setattr(self, name, value if np.ndim(value) else value.item())
+        self.buffers = self.defined = None
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def plotData(self, well, xmin, xmax, y1min, y1max, y2min, y2max):
+        """Plots log-log of p and t.dp/dt vs total time, with the flow regimes identified shaded"""
+
+        self.fig, self.yaxis1 = plt.subplots()
+        self.yaxis2 = self.yaxis1.twinx()
+
+        defined = self.tdp > 0
+        p1, = self.yaxis1.loglog(self.T, well.p_shut, 'b-')
+        p2, = self.yaxis2.loglog(self.T[defined], self.tdp[defined], 'r-')
+
+        tShut = well.tp / 3600
+        for name, color in (('radial', 'g'), ('linear', 'y')):
+            if getattr(self, name + 'Start') is not None:
+                self.yaxis1.axvspan(getattr(self, name + 'Start') + tShut, getattr(self, name + 'End') + tShut,
+                                    color=color, alpha=0.2, label='Pseudo-' + name)
+        if self.radialStart is not None or self.linearStart is not None:
+            self.yaxis1.legend(loc='lower left')
+
+        if self.fig.canvas.manager is not None:  # No window without a gui backend
+            self.fig.canvas.manager.set_window_title('ACA')
+        self.fig.suptitle('After Closure Analysis Plot')
+        self.yaxis1.set_xlabel('Total time [hrs]')
+        self.yaxis1.set_ylabel('Pressure [psi]')
+        self.yaxis2.set_ylabel('$t.dp/dt$ [psi]')
+
+        # Log axes cannot start at zero, limits are only set when both are given
+        if 0 < xmin < xmax:
+            self.yaxis1.set_xlim(xmin, xmax)
+        if 0 < y1min < y1max:
+            self.yaxis1.set_ylim(y1min, y1max)
+        if 0 < y2min < y2max:
+            self.yaxis2.set_ylim(y2min, y2max)
+
+        tkw = dict(size=4, width=1.5)
+        self.yaxis1.tick_params(axis='x', **tkw)
+        self.yaxis1.tick_params(axis='y', colors=p1.get_color(), **tkw)
+        self.yaxis2.tick_params(axis='y', colors=p2.get_color(), **tkw)
+        self.yaxis1.yaxis.label.set_color(p1.get_color())
+        self.yaxis2.yaxis.label.set_color(p2.get_color())
+
+        plt.draw()
+
+########################################################################################################################
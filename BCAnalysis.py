@@ -21,6 +21,17 @@ import matplotlib.pyplot as plt
 class BCAnalysis:
     """Super class for performing Before Closure Analyses"""
 
+    arrays = ()  # Names of the arrays computed by the analysis of the sub class
+    # Closure results
+    picks = ('dwindow', 'window', 'xClosure', 'pClosure', 'tClosure', 'closureSlope', 'closureResidual')
+
+    # Placement and style of the closure annotation, with an arrow from the text to the closure point
+    annotationStyle = dict(xycoords='data', xytext=(0.5, .8), textcoords='axes fraction',
+                           arrowprops=dict(facecolor='black',
+                                           connectionstyle='arc, angleA=-90, angleB=0, armA=0, armB=40, rad=0.0',
+                                           arrowstyle='->'),
+                           bbox=dict(boxstyle='round', alpha=0.2))
+
     # ---------------------------------------------------------------------------------------------------------------- #
     def __init__(self):
         """Constructor for initializing shared variables of sub classes"""
@@ -38,48 +49,341 @@ class BCAnalysis:
         self.tClosure = 1  # Closure time in hours
         self.cidDraw = None  # Handle for connection id to connect mouse motion to figure
         self.cidClick = None  # Handle for connection id to connect mouse click to figure
+        self.cidBlit = None  # Handle for connection id to cache the figure background after each full redraw
+        self.background = None  # Cached figure without the guide line being drawn, for blitting
+        self.guide = None  # Guide line following the mouse pointer while picking
         self.annClosure = None  # Handle for annotation on figure displaying closure pressure and time
+        self.closureSlope = None  # Slope of the line through origin on the log derivative (automatic pick)
+        self.closureResidual = None  # RMS departure from the line through origin before closure / value at closure
+        self.dwindow = None  # Smoothing window of the computed derivative
+        self.window = 'index'  # Units of dwindow: number of points (index), x-variable (x) or natural log of tD (log)
+        self.buffers = None  # Growable storage of the computed arrays, created on the first update
 
     # ---------------------------------------------------------------------------------------------------------------- #
     @staticmethod
     def smoothDerivative(X, Y, dwindow):
         """ Computes smooth derivatives by obtaining slope of the least square line through the selected window"""
 
+        X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
         dYdX = np.zeros((np.shape(Y)[0],))
-        for i in range(0 + dwindow, np.shape(X)[0] - dwindow):
+        idx = np.arange(0 + dwindow, np.shape(X)[0] - dwindow)
+        if idx.size == 0 or dwindow == 0:  # An empty window has no slope, zero as before
+            return dYdX
+
+        b = BCAnalysis.windowSlopes(X, Y, 2 * dwindow)[idx - dwindow]
+
+        # Windows with identical x values have no unique slope, let the least square solver pick one as before
+        for i in idx[np.isnan(b)]:
             x = X[i - dwindow:i + dwindow]
             y = Y[i - dwindow:i + dwindow]
-            _, b = np.linalg.lstsq(np.column_stack((np.ones_like(x), x)), y, rcond=None)[0]
-            dYdX[i] = abs(b)
+            _, b[i - dwindow] = np.linalg.lstsq(np.column_stack((np.ones_like(x), x)), y, rcond=None)[0]
+
+        dYdX[idx] = np.abs(b)
         return dYdX
 
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def sweepDerivative(X, Y, dwindows):
+        """Computes smooth derivatives for several windows at once, one row per window in the order of dwindows. The
+        block sums of the data (see blockSums) are taken once for the longest window and every row is read from them in
+        O(n) operations, so it agrees with smoothDerivative to the round off of a direct fit. Windows with identical x
+        values give a zero derivative."""
+
+        X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        n = np.shape(X)[0]
+        dYdX = np.zeros((len(dwindows), n))
+        used = [dw for dw in dwindows if 1 <= dw and n - 2 * dw > 0]
+        if not used:
+            return dYdX
+        blocks = BCAnalysis.blockSums(X, Y, 0, n, 2 * max(used))
+        for row, dw in zip(dYdX, dwindows):
+            if dw in used:
+                lo = np.arange(n - 2 * dw)
+                b = BCAnalysis.sumSlopes(blocks, lo, lo + 2 * dw)
+                row[dw:n - dw] = np.where(np.isnan(b), 0, np.abs(b))
+        return dYdX
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def windowedDerivative(X, Y, W, halfwidth, start=0, lower=None):
+        """Computes smooth derivatives like smoothDerivative, but the window of each point holds the points whose W is
+        within +/- halfwidth of its own. W must be sorted ascending, e.g. X itself or the log of time (Bourdet-style),
+        so the smoothing does not depend on the sampling. Windows are found by binary search and fitted from block
+        sums local to each window (see rangeSlopes). Points whose window reaches beyond the data or holds less than 3
+        points are zero. Only the points from start onwards are computed and returned. The data may also be a tail of
+        the record reaching a window below start, with lower the first finite W of the whole record."""
+
+        X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        W = np.asarray(W, dtype=float)
+        w = W[start:]
+
+        # W is sorted, so its finite values (e.g. after the -inf of log(0) at shut-in) are found by binary search
+        first = np.searchsorted(W, -np.inf, side='right')
+        last = np.searchsorted(W, np.inf, side='left') - 1
+        if last < first:
+            return np.zeros(np.shape(w))
+        lower = W[first] if lower is None else lower
+
+        lo = np.searchsorted(W, w - halfwidth, side='left')
+        hi = np.searchsorted(W, w + halfwidth, side='right')
+        b = BCAnalysis.rangeSlopes(X, Y, lo, hi)
+
+        valid = (w - halfwidth >= lower) & (w + halfwidth <= W[last]) & (hi - lo >= 3) & ~np.isnan(b)
+        return np.where(valid, np.abs(b), 0)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def sweepClosure(self, well, X, Y, dwindows):
+        """Picks closure automatically on X.dY/dX for each of the windows (see sweepDerivative). Returns a dict with the
+        closure point, pressure, time and residual per window and the mean, standard deviation, minimum and maximum of
+        closure pressure and time over the windows."""
+
+        dYdX = BCAnalysis.sweepDerivative(X, Y, dwindows)
+        picks = dict(dwindow=[], xClosure=[], pClosure=[], tClosure=[], residual=[])
+        for dwindow, row in zip(dwindows, dYdX):
+            idx, _, residual = BCAnalysis.fitClosureLine(X, X * row)
+            if idx is None:
+                continue
+            pClosure, tClosure = self.closureAt(well, X[idx])
+            for key, value in zip(picks, (dwindow, X[idx], pClosure, tClosure, residual)):
+                picks[key].append(value)
+
+        result = {key: np.array(value) for key, value in picks.items()}
+        for key in ('pClosure', 'tClosure'):
+            values = result[key] if result[key].size else np.array([np.nan])
+            result[key + 'Band'] = dict(mean=float(np.mean(values)), std=float(np.std(values)),
+                                        min=float(np.min(values)), max=float(np.max(values)))
+        return result
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def derivative(self, X, Y, tD):
+        """Computes the smooth derivative with the window of the analysis: dwindow points either side ('index'), or
+        dwindow either side in units of X ('x') or of the natural log of tD ('log')"""
+
+        if self.window == 'index':
+            return BCAnalysis.smoothDerivative(X, Y, self.dwindow)
+        return BCAnalysis.windowedDerivative(X, Y, self.windowVariable(X, tD), self.dwindow)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def windowVariable(self, X, tD):
+        """Variable in which the derivative window of the analysis is defined"""
+
+        if self.window == 'x':
+            return X
+        if self.window == 'log':
+            with np.errstate(divide='ignore'):
+                return np.log(tD)
+        raise ValueError('Unknown derivative window {}, use index, x or log'.format(self.window))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def windowIndex(self, X, tD, w):
+        """Index of the first point whose window variable is above w, by binary search of X or tD (both ascending)
+        without computing the window variable"""
+
+        if self.window == 'log':
+            return np.searchsorted(tD, np.exp(w), side='right')
+        return np.searchsorted(X, w, side='right')
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def extendDerivative(self, X, Y, dYdX, nOld, tD):
+        """Computes the derivative for the windows touched by the points appended after the first nOld points. dYdX
+        must already have the length of X, returns the index from which the derivative has changed."""
+
+        d = self.dwindow
+        if self.window != 'index':
+            # The window variable is only computed for the tail reached by the windows of the changed points. The tail
+            # starts a couple of points early in case exp(log(tD)) rounds across a sample.
+            wOld = self.windowVariable(X[nOld - 1:nOld], tD[nOld - 1:nOld])[0]
+            k = max(self.windowIndex(X, tD, wOld - 2 * d) - 2, 0)
+            W = self.windowVariable(X[k:], tD[k:])
+            j = self.windowIndex(X, tD, -np.inf)  # First point with a finite window variable
+            lower = self.windowVariable(X[j:j + 1], tD[j:j + 1])[0] if j < np.shape(X)[0] else np.inf
+            start = k + np.searchsorted(W, wOld - d, side='left')
+            dYdX[start:] = BCAnalysis.windowedDerivative(X[k:], Y[k:], W, d, start - k, lower)
+            return start
+
+        lo = max(d, nOld - d)
+        hi = np.shape(X)[0] - d
+        if hi > lo:
+            dYdX[lo:hi] = BCAnalysis.smoothDerivative(X[lo - d:hi + d], Y[lo - d:hi + d], d)[d:d + hi - lo]
+        return max(0, nOld - d)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def windowSlopes(X, Y, length):
+        """Slopes of the least square lines through every window X[i:i + length] in O(n) operations. The data is split
+        into blocks of the window length and every window is the sum of a block suffix and the next block's prefix
+        (van Herk/Gil-Werman). Sums are taken relative to the first point of each block, so round off stays at the
+        level of a direct fit of the window. Returns nan for windows where all x values are the same."""
+
+        if length < 1:
+            raise ValueError('The window length must be at least 1, got {}'.format(length))
+        lo = np.arange(np.shape(X)[0] - length + 1)
+        return BCAnalysis.blockSlopes(X, Y, lo, lo + length, length)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def rangeSlopes(X, Y, lo, hi):
+        """Slopes of the least square lines through the windows X[lo:hi] of any lengths. Windows are grouped by length
+        in powers of two and each group is summed over blocks of its largest length (see blockSlopes), so the sums stay
+        local to every window and the cost is O(n) per group. Returns nan for windows with less than two distinct x."""
+
+        lo = np.asarray(lo)
+        hi = np.asarray(hi)
+        b = np.full(np.shape(lo), np.nan)
+        length = 2 ** np.ceil(np.log2(np.maximum(hi - lo, 1))).astype(int)
+        for block in np.unique(length):
+            group = np.flatnonzero(length == block)
+            b[group] = BCAnalysis.blockSlopes(X, Y, lo[group], hi[group], block)
+        return b
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def blockSlopes(X, Y, lo, hi, length):
+        """Slopes of the least square lines through the windows X[lo:hi], none longer than length. The data reached by
+        the windows is split into blocks of that length and each window is a block suffix, less the suffix past its
+        end, plus the prefix of the next block (van Herk/Gil-Werman). Sums are relative to the first point of each
+        block, so round off stays at the level of a direct fit of the window. Returns nan for windows where all x
+        values are the same."""
+
+        if np.size(lo) == 0:
+            return np.zeros(np.shape(lo))
+        return BCAnalysis.sumSlopes(BCAnalysis.blockSums(X, Y, int(np.min(lo)), int(np.max(hi)), length), lo, hi)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def blockSums(X, Y, first, last, length):
+        """Prefix and suffix sums of the moments [x, y, x^2, x.y] of the points X[first:last] within blocks of length,
+        relative to the first point of each block. Returns them with the block references for sumSlopes."""
+
+        n = last - first
+        x = np.asarray(X, dtype=float)[first:last]
+        y = np.asarray(Y, dtype=float)[first:last]
+
+        nb = -(-n // length)  # Number of blocks
+        xb = np.zeros((nb + 1, length))
+        yb = np.zeros((nb + 1, length))
+        xb.flat[:n] = x
+        yb.flat[:n] = y
+        xb.flat[n:] = x[-1]
+        yb.flat[n:] = y[-1]
+        xref = xb[:, 0].copy()
+        yref = yb[:, 0].copy()
+        xb -= xref[:, None]
+        yb -= yref[:, None]
+
+        # Moments [x, y, x^2, x.y] of each point relative to its block reference
+        moments = np.stack((xb, yb, xb * xb, xb * yb))
+        prefix = np.zeros((4, nb + 1, length + 1))
+        np.cumsum(moments, axis=2, out=prefix[:, :, 1:])
+        suffix = prefix[:, :, -1:] - prefix
+        return first, length, xref, yref, prefix, suffix
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def sumSlopes(blocks, lo, hi):
+        """Slopes of the least square lines through the windows X[lo:hi], none longer than the blocks, from the block
+        sums of blockSums (see blockSlopes). Returns nan for windows where all x values are the same."""
+
+        first, length, xref, yref, prefix, suffix = blocks
+        lo = lo - first
+        hi = hi - first
+
+        # Points of the window in its first block, and in the next block
+        blk, off = np.divmod(lo, length)
+        end = hi - blk * length
+        inside = np.minimum(end, length)
+        nxt = np.maximum(end - length, 0)
+        sx, sy, sxx, sxy = suffix[:, blk, off] - suffix[:, blk, inside]
+        px, py, pxx, pxy = prefix[:, blk + 1, nxt]
+
+        # Shift the prefix sums of the next block to the reference of the current block
+        dx = xref[blk + 1] - xref[blk]
+        dy = yref[blk + 1] - yref[blk]
+        sx, sy, sxx, sxy = (sx + px + nxt * dx,
+                            sy + py + nxt * dy,
+                            sxx + pxx + 2 * dx * px + nxt * dx * dx,
+                            sxy + pxy + dx * py + dy * px + nxt * dx * dy)
+
+        m = hi - lo
+        num = m * sxy - sx * sy
+        den = m * sxx - sx * sx
+        degenerate = den <= 1e-12 * m * sxx
+        return np.where(degenerate, np.nan, num / np.where(degenerate, 1, den))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def interpolateSorted(X, Y, x):
+        """Y at x by binary search of the samples of X (sorted ascending) either side of x and linear interpolation,
+        O(log n). Clipped to the first and last samples."""
+
+        n = np.shape(X)[0]
+        if n == 1:
+            return Y[0]
+        i = np.clip(np.searchsorted(X, x, side='right'), 1, n - 1)
+        x0, x1 = X[i - 1], X[i]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = np.clip(np.where(x1 > x0, (x - x0) / (x1 - x0), 0), 0, 1)
+        return Y[i - 1] + w * (Y[i] - Y[i - 1])
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def getState(self):
+        """Returns the computed arrays and closure picks (if any) as a dict of arrays, e.g. for saving"""
+
+        state = {name: np.asarray(getattr(self, name)) for name in self.arrays}
+        if self.xClosure is not None:
+            state.update({name: np.asarray(getattr(self, name)) for name in self.picks
+                          if getattr(self, name) is not None})
+        else:
+            state['dwindow'] = np.asarray(self.dwindow)
+            state['window'] = np.asarray(self.window)
+        return state
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def setState(self, state):
+        """Restores the arrays and closure picks returned by getState"""
+
+        for name, value in state.items():
+            setattr(self, name, value if np.ndim(value) else value.item())
+        self.buffers = None
+
     # ---------------------------------------------------------------------------------------------------------------- #
     def threeAxesFigure(self):
         """Creates a blank formatted figure with three y-axes"""
 
-        self.fig, yaxis1 = plt.subplots()
-        self.fig.subplots_adjust(right=0.8)
+        self.fig = plt.figure()
+        (self.yaxis1, self.yaxis2, self.yaxis3), (self.pressPlot, self.logDerPlot, self.derPlot) = \
+            BCAnalysis.threeAxes(self.fig)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def threeAxes(fig):
+        """Adds the three formatted y-axes to a blank figure (also used by the report renderer). Returns the axes and
+        an empty line on each of them: pressure, log derivative and derivative."""
+
+        fig.subplots_adjust(right=0.8)
+        yaxis1 = fig.add_subplot()
         yaxis2 = yaxis1.twinx()
         yaxis3 = yaxis1.twinx()
         yaxis3.spines["right"].set_position(("axes", 1.15))
 
-        self.pressPlot, = yaxis1.plot([None, None], [None, None], 'b-')
-        self.logDerPlot, = yaxis2.plot([None, None], [None, None], 'r-')
-        self.derPlot, = yaxis3.plot([None, None], [None, None], 'g-')
+        pressPlot, = yaxis1.plot([None, None], [None, None], 'b-')
+        logDerPlot, = yaxis2.plot([None, None], [None, None], 'r-')
+        derPlot, = yaxis3.plot([None, None], [None, None], 'g-')
 
         tkw = dict(size=4, width=1.5)
         yaxis1.tick_params(axis='x', **tkw)
-        yaxis1.tick_params(axis='y', colors=self.pressPlot.get_color(), **tkw)
-        yaxis2.tick_params(axis='y', colors=self.logDerPlot.get_color(), **tkw)
-        yaxis3.tick_params(axis='y', colors=self.derPlot.get_color(), **tkw)
+        yaxis1.tick_params(axis='y', colors=pressPlot.get_color(), **tkw)
+        yaxis2.tick_params(axis='y', colors=logDerPlot.get_color(), **tkw)
+        yaxis3.tick_params(axis='y', colors=derPlot.get_color(), **tkw)
 
-        yaxis1.yaxis.label.set_color(self.pressPlot.get_color())
-        yaxis2.yaxis.label.set_color(self.logDerPlot.get_color())
-        yaxis3.yaxis.label.set_color(self.derPlot.get_color())
+        yaxis1.yaxis.label.set_color(pressPlot.get_color())
+        yaxis2.yaxis.label.set_color(logDerPlot.get_color())
+        yaxis3.yaxis.label.set_color(derPlot.get_color())
 
-        self.yaxis1 = yaxis1
-        self.yaxis2 = yaxis2
-        self.yaxis3 = yaxis3
+        return (yaxis1, yaxis2, yaxis3), (pressPlot, logDerPlot, derPlot)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     def setAxesLims(self, xmin, xmax, y1min, y1max, y2min, y2max, y3min, y3max):
@@ -102,15 +406,18 @@ class BCAnalysis:
 
         # Removes the vertical and straight lines from plot if the identify closure is called again on same figure.
         if self.stLnPlot is not None:
-            self.yaxis2.lines.remove(self.stLnPlot)
+            self.stLnPlot.remove()
         if self.clsrPtPlot is not None:
-            self.yaxis2.lines.remove(self.clsrPtPlot)
+            self.clsrPtPlot.remove()
         self.stLnPlot = None
         self.clsrPtPlot = None
 
-        # Show plot and turn on interactivity
+        # Show plot and turn on interactivity. The background is cached after every full redraw (resize, zoom) so that
+        # mouse motion only redraws the guide line.
         plt.ion()
         plt.show()
+        self.background = None
+        self.cidBlit = self.fig.canvas.mpl_connect('draw_event', self.cacheBackground)
 
         print('Click to draw the straight line through origin. \n')
         self.cidDraw = self.fig.canvas.mpl_connect('motion_notify_event', self.drawStraightLine)
@@ -118,12 +425,81 @@ class BCAnalysis:
         self.fig.canvas.start_event_loop(timeout=0)
 
         print('Click to select closure pressure. \n')
-        self.cidDraw = self.fig.canvas.mpl_connect('motion_notify_event', self.drawVerticalLine)
-        self.cidClick = self.fig.canvas.mpl_connect('button_press_event', self.drawVerticalLine)
+        self.cidDraw = self.fig.canvas.mpl_connect('motion_notify_event', lambda e: self.drawVerticalLine(e, well))
+        self.cidClick = self.fig.canvas.mpl_connect('button_press_event', lambda e: self.drawVerticalLine(e, well))
         self.fig.canvas.start_event_loop(timeout=0)
 
+        self.fig.canvas.mpl_disconnect(self.cidBlit)
+        self.background = None
         plt.ioff()
 
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def fitClosureLine(X, XdYdX):
+        """Fits a line through the origin to the log derivative followed by a straight line departing from it (hinge)
+        for every candidate closure point at once, using cumulative sums. Returns the index of the best closure point,
+        the slope of the line through origin and the relative RMS residual of the data about it before closure."""
+
+        X = np.asarray(X, dtype=float)
+        XdYdX = np.asarray(XdYdX, dtype=float)
+
+        # Only the points where the derivative is defined (edges are zeroed by the smoothing window)
+        nz = np.nonzero(XdYdX)[0]
+        if nz.size < 3:
+            return None, None, None
+        lo, hi = nz[0], nz[-1] + 1
+        x = X[lo:hi]
+        y = XdYdX[lo:hi]
+        n = np.shape(x)[0]
+
+        # Sums before and including (c*) and after (a*) each candidate closure point xc
+        cx, cy, cxx, cxy, cyy = np.cumsum((x, y, x * x, x * y, y * y), axis=1)
+        ax, ay, axx, axy = cx[-1] - cx, cy[-1] - cy, cxx[-1] - cxx, cxy[-1] - cxy
+        xc = x
+        c = n - 1 - np.arange(n)
+
+        # Normal equations for y = m.min(x, xc) + s.max(x - xc, 0)
+        a11 = cxx + c * xc * xc
+        a12 = xc * (ax - c * xc)
+        a22 = axx - 2 * xc * ax + c * xc * xc
+        b1 = cxy + xc * ay
+        b2 = axy - xc * ay
+        det = a11 * a22 - a12 * a12
+        valid = (det > 0) & (c > 0) & (np.arange(n) > 0)
+        det = np.where(valid, det, 1)
+        m = (a22 * b1 - a12 * b2) / det
+        s = (a11 * b2 - a12 * b1) / det
+
+        # Explained sum of squares, maximized by the least square closure point
+        k = np.argmax(np.where(valid, m * b1 + s * b2, -np.inf))
+        if not valid[k] or m[k] <= 0:
+            return None, None, None
+
+        sse = cyy[k] - 2 * m[k] * cxy[k] + m[k] ** 2 * cxx[k]
+        residual = np.sqrt(max(sse, 0) / (k + 1)) / (m[k] * xc[k])
+        return lo + k, m[k], residual
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def autoIdentifyClosure(self, X, XdYdX):
+        """Identify closure without user input by fitting the straight line through origin and selecting the departure
+        from the line as closure. Draws the lines on the figure if there is one."""
+
+        idx, self.closureSlope, self.closureResidual = BCAnalysis.fitClosureLine(X, XdYdX)
+        if idx is None:
+            raise ValueError('Unable to identify closure automatically, check the data and dwindow')
+        self.xClosure = X[idx]
+
+        if self.fig is not None:
+            if self.stLnPlot is not None:
+                self.stLnPlot.remove()
+            if self.clsrPtPlot is not None:
+                self.clsrPtPlot.remove()
+            xmax = self.yaxis2.axes.viewLim.xmax
+            self.stLnPlot, = self.yaxis2.plot([0, xmax], [0, self.closureSlope * xmax], 'k--',
+                                              scalex=False, scaley=False)
+            self.clsrPtPlot, = self.yaxis2.plot([self.xClosure, self.xClosure], [0, self.yaxis2.axes.viewLim.ymax],
+                                                'k--', scalex=False, scaley=False)
+
     # ---------------------------------------------------------------------------------------------------------------- #
     def drawStraightLine(self, event):
         """Draw the straight line through origin by following the mouse pointer"""
@@ -139,15 +515,17 @@ class BCAnalysis:
         x, xdydx = self.yaxis2.transData.inverted().transform((event.x, event.y))
 
         if self.stLnPlot is None:
-            self.stLnPlot, = self.yaxis2.plot([0, x], [0, xdydx], 'k--')
+            self.stLnPlot, = self.yaxis2.plot([0, x], [0, xdydx], 'k--', scalex=False, scaley=False,
+                                              animated=self.fig.canvas.supports_blit)
         else:
             self.stLnPlot.set_ydata([0, xdydx])
             self.stLnPlot.set_xdata([0, x])
-        self.fig.canvas.draw()
+        self.drawGuide(self.stLnPlot, event.button == 1)
 
     # ---------------------------------------------------------------------------------------------------------------- #
-    def drawVerticalLine(self, event):
-        """Draw the Vertical line following the mouse pointer"""
+    def drawVerticalLine(self, event, well=None):
+        """Draw the Vertical line following the mouse pointer. If the well is given, the closure pressure and time at
+        the pointer are shown in the toolbar."""
 
         if event.inaxes is None:
             return
@@ -160,54 +538,69 @@ class BCAnalysis:
         x, _ = self.yaxis2.transData.inverted().transform((event.x, event.y))
 
         if self.clsrPtPlot is None:
-            self.clsrPtPlot, = self.yaxis2.plot([x, x], [0, self.yaxis2.axes.viewLim.ymax], 'k--')
+            self.clsrPtPlot, = self.yaxis2.plot([x, x], [0, self.yaxis2.axes.viewLim.ymax], 'k--', scalex=False,
+                                                scaley=False, animated=self.fig.canvas.supports_blit)
         else:
             self.clsrPtPlot.set_ydata([0, self.yaxis2.axes.viewLim.ymax])
             self.clsrPtPlot.set_xdata([x, x])
         # x is closure on either G-function scale or square root time scale (not time)
         self.xClosure = x
-        self.fig.canvas.draw()
+        toolbar = self.fig.canvas.toolbar
+        if well is not None and toolbar is not None and x >= 0:
+            toolbar.set_message('Closure Pressure = {:.1f} psi, Closure Time (after s/i) = {:.2f} hrs'.format(
+                *self.closureAt(well, x)))
+        self.drawGuide(self.clsrPtPlot, event.button == 1)
 
     # ---------------------------------------------------------------------------------------------------------------- #
-    def annotateClosure(self):
-        """Annotates the figure with closure pressure and time with arrow indicating the coordinates."""
+    def cacheBackground(self, event):
+        """Caches the figure without the guide line after a full redraw and draws the guide line on top of it"""
+
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        if self.guide is not None and self.guide.get_animated():
+            self.yaxis2.draw_artist(self.guide)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def drawGuide(self, line, final):
+        """Draws the guide line following the mouse pointer by restoring the cached background and blitting only the
+        line. When the point is selected (final), the line becomes part of the figure which is then redrawn once."""
+
+        canvas = self.fig.canvas
+        self.guide = line
+        if final:
+            line.set_animated(False)
+            self.guide = None
+            canvas.draw()
+        elif not line.get_animated():
+            canvas.draw()
+        else:
+            if self.background is None:
+                canvas.draw()  # Caches the background through the draw event
+            canvas.restore_region(self.background)
+            self.yaxis2.draw_artist(line)
+            canvas.blit(self.fig.bbox)
 
-        annotationText = 'Closure Pressure = {pc:.1f} psi \nClosure Time (after s/i) = {tc:.2f}  hrs ' \
-            .format(pc=self.pClosure, tc=self.tClosure)
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def closureText(pClosure, tClosure):
+        """Text of the closure annotation"""
 
-        arrow_props = dict(facecolor='black',
-                           connectionstyle='arc, angleA=-90, angleB=0, armA=0, armB=40, rad=0.0',
-                           arrowstyle='->')
+        return 'Closure Pressure = {pc:.1f} psi \nClosure Time (after s/i) = {tc:.2f}  hrs ' \
+            .format(pc=pClosure, tc=tClosure)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def annotateClosure(self):
+        """Annotates the figure with closure pressure and time with arrow indicating the coordinates."""
 
         # if annotation exists, remove it
         if self.annClosure is not None:
-            self.fig.texts.pop()
-        self.annClosure = self.yaxis1.annotate(annotationText,
-                                               xy=(self.xClosure, self.pClosure), xycoords='data',
-                                               xytext=(0.5, .8), textcoords='axes fraction',
-                                               arrowprops=arrow_props, bbox=dict(boxstyle='round', alpha=0.2))
+            self.annClosure.remove()
+        # Annotation on the top axes so no line is drawn over it, pointing at the pressure axes data
+        self.annClosure = self.yaxis3.annotate(BCAnalysis.closureText(self.pClosure, self.tClosure),
+                                               xy=(self.xClosure, self.pClosure),
+                                               **dict(BCAnalysis.annotationStyle, xycoords=self.yaxis1.transData))
 
-        self.fig.texts.append(self.yaxis1.texts.pop())
         # Updates the figure with annotation
         plt.draw()
 
 
-# TODO: Future Code for ACA
-# ACA Soliman: Plots log - log of p and t.dp / dt vs total time
-#
-#     well.figPt = figure;
-#     AX = plotyy(well.t / 3600, well.p, well.t / 3600, well.tdpt);
-#     set(AX, 'xscale', 'log', 'yscale', 'log');
-#
-#     xlabel('Total time [hrs]')
-#     xlim(AX, [xmin / 3600 xmax])
-#
-#     ylabel('Pressure [psi]')
-#     ylim([y1min y1max])
-#
-#     ylabel(AX(2), 't.dp/dt [psi]')
-#     ylim(AX(2), [y2min y2max])
-# end
-##
-
 ########################################################################################################################
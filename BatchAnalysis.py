@@ -0,0 +1,231 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+# Runs the G-function and square root time analyses with automatic closure picking for many wells in parallel.
+#
+# Usage: python BatchAnalysis.py manifest.csv results.csv [--processes N] [--cycles [MIN_GAP]] [--store results.db]
+#                                                          [--curves]
+#
+# The manifest is a csv file with a header and one well per row with the columns:
+#   well, filename, t_col, p_col, r_col, tp, skip_rows, dwindow
+# Column numbers start at 1 as in Well_1Analysis.py and file names are relative to the manifest. A blank tp is detected
+# from the rate. With --cycles, every injection/falloff cycle of each well is analyzed as its own row with its tp
+# detected from the rate (a tp given in the manifest is ignored with a warning), pumping periods less than MIN_GAP
+# seconds apart (e.g. steps of a step-rate test) being one cycle. Optional columns date (of the test, ISO format) and
+# depth [ft] are kept in the results store (--store), with the curves if --curves is given.
+########################################################################################################################
+
+import os
+import csv
+import argparse
+import warnings
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from DFITAnalysis import DFITAnalysis
+from ResultCache import fileHash
+from ResultStore import ResultStore, packCurves
+
+# Columns of the results table
+RESULT_FIELDS = ['well', 'filename', 'cycle', 'tp', 'status', 'error',
+                 'G_pClosure', 'G_tClosure', 'G_residual',
+                 'SRT_pClosure', 'SRT_tClosure', 'SRT_residual']
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def readManifest(filename):
+    """Reads the wells from the manifest csv file, returns a list of dicts with the parameters of each well. Rows that
+    cannot be parsed are kept with the error, so they are reported as failed wells rather than stopping the batch."""
+
+    folder = os.path.dirname(os.path.abspath(filename))
+    wells = []
+    with open(filename, newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                wells.append(dict(well=row['well'],
+                                  filename=os.path.join(folder, row['filename']),
+                                  t_col=int(row['t_col']),
+                                  p_col=int(row['p_col']),
+                                  r_col=int(row['r_col']),
+                                  tp=float(row['tp']) if row['tp'].strip() else None,
+                                  skip_rows=int(row['skip_rows']),
+                                  dwindow=int(row['dwindow']),
+                                  date=(row.get('date') or '').strip() or None,
+                                  depth=float(row['depth']) if (row.get('depth') or '').strip() else None))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                line = reader.line_num
+                wells.append(dict(well=row.get('well') or 'line {}'.format(line), filename=row.get('filename'),
+                                  dwindow=row.get('dwindow'),
+                                  error='Invalid manifest line {}: {}: {}'.format(line, type(e).__name__, e)))
+    return wells
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def analyzeWell(spec):
+    """Loads one well, or takes the data of a cycle given by segmentWell, and runs both analyses with automatic
+    closure picking. Errors are reported in the result instead of being raised so that one bad well does not stop the
+    batch."""
+
+    result = dict(well=spec['well'], filename=spec['filename'], cycle=spec.get('cycle', ''), status='ok', error='',
+                  dwindow=spec['dwindow'], window='index', date=spec.get('date'), depth=spec.get('depth'))
+    if 'error' in spec:  # The well could not be split into cycles
+        return dict(result, status='failed', error=spec['error'])
+    try:
+        if 'data' in spec:
+            well = DFITAnalysis.fromArrays(*spec['data'], spec['tp'])
+        else:
+            well = DFITAnalysis(spec['filename'], spec['skip_rows'], spec['t_col'] - 1, spec['p_col'] - 1,
+                                spec['r_col'] - 1, spec['tp'], plot=False)
+        result['tp'] = float(well.tp)
+        if spec.get('store') and spec['filename'] is not None:  # Only the results store needs the file hash
+            result['file_hash'] = spec.get('file_hash') or fileHash(spec['filename'])
+        well.compute(spec['dwindow'])
+        for prefix, analysis in (('G', well.GFunction), ('SRT', well.SquareRoot)):
+            analysis.autoIdentifyClosure(well, verbose=False)
+            result[prefix + '_pClosure'] = float(analysis.pClosure)
+            result[prefix + '_tClosure'] = float(analysis.tClosure)
+            result[prefix + '_residual'] = float(analysis.closureResidual)
+            result[prefix + '_slope'] = float(analysis.closureSlope)
+            if spec.get('curves'):  # Compressed here, in parallel, rather than when stored
+                result[prefix + '_curves'] = packCurves(analysis.getState())
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    return result
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def segmentWell(spec, min_gap=0):
+    """Loads one well and splits it into its injection cycles. Returns a spec per cycle holding the data of the cycle,
+    or a single spec with the error if the well cannot be loaded."""
+
+    if 'error' in spec:  # Invalid manifest row
+        return [spec]
+    if spec.get('tp') is not None:
+        warnings.warn('The tp of {} in the manifest is ignored with --cycles, each cycle has its own tp detected from '
+                      'the rate'.format(spec['well']))
+    try:
+        well = DFITAnalysis(spec['filename'], spec['skip_rows'], spec['t_col'] - 1, spec['p_col'] - 1,
+                            spec['r_col'] - 1, None, plot=False)
+        segments = well.segments(min_gap=min_gap)
+        if not segments:
+            raise ValueError('No injection followed by shut-in found in the rate')
+    except Exception as e:
+        return [dict(spec, error='{}: {}'.format(type(e).__name__, e))]
+    file_hash = fileHash(spec['filename']) if spec.get('store') else None
+    return [dict(spec, cycle=i + 1, tp=segment.tp, data=segment.data, file_hash=file_hash)
+            for i, segment in enumerate(segments)]
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def analyzeSegments(well, dwindow, processes=None, min_gap=0, store=False):
+    """Analyzes every injection cycle of a loaded well in a pool of processes, returns the results in time order. With
+    store, the results hold the hash of the data file for the results store."""
+
+    file_hash = fileHash(well.filename) if store and well.filename is not None else None
+    specs = [dict(well=well.filename, filename=well.filename, cycle=i + 1, tp=segment.tp, data=segment.data,
+                  dwindow=dwindow, store=store, file_hash=file_hash)
+             for i, segment in enumerate(well.segments(min_gap=min_gap))]
+    return runJobs(analyzeWell, specs, processes)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def runJobs(func, specs, processes=None, failed=None):
+    """Runs func on every spec in a pool of processes (one per core by default) and returns the results in the order
+    of the specs. Results are collected as they complete. A worker that dies breaks the pool and stops the jobs still
+    running, so these are run again, each in a process of its own, and only the job that kills its process again is
+    lost. Jobs that cannot complete get failed(spec, error) as result, by default the failed result of analyzeWell."""
+
+    if failed is None:
+        failed = lambda spec, error: analyzeWell(dict(spec, error=error))
+    results = [None] * len(specs)
+    broken = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(func, spec): i for i, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except BrokenProcessPool:
+                broken.append(futures[future])
+            except Exception as e:
+                results[futures[future]] = failed(specs[futures[future]], '{}: {}'.format(type(e).__name__, e))
+
+    if broken:
+        with ThreadPoolExecutor(max_workers=processes or os.cpu_count()) as threads:
+            futures = {threads.submit(runAlone, func, specs[i]): i for i in broken}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = failed(specs[futures[future]], '{}: {}'.format(type(e).__name__, e))
+    return results
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def runAlone(func, spec):
+    """Runs func on the spec in a process of its own"""
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(func, spec).result()
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def runBatch(wells, processes=None, cycles=False, min_gap=0):
+    """Analyzes the wells in a pool of processes (one per core by default), returns the results in manifest order.
+    With cycles, the wells are first split into their injection cycles (also in parallel) and every cycle is analyzed
+    as its own job. Wells that fail, also by bringing their worker down, are reported as failed results."""
+
+    if cycles:
+        wells = [cycle for well in runJobs(partial(segmentWell, min_gap=min_gap), wells, processes,
+                                           lambda spec, error: [dict(spec, error=error)]) for cycle in well]
+    return runJobs(analyzeWell, wells, processes)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def writeResults(filename, results):
+    """Writes the results table to a csv file"""
+
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batch DFIT analysis with automatic closure picking')
+    parser.add_argument('manifest', help='csv file listing the wells and their parameters')
+    parser.add_argument('results', help='csv file to write the closure results to')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('--cycles', nargs='?', type=float, const=0, default=None, metavar='MIN_GAP',
+                        help='analyze every injection cycle, merging pumping periods less than MIN_GAP s apart')
+    parser.add_argument('--store', default=None, help='SQLite results store to add the closure picks to')
+    parser.add_argument('--curves', action='store_true', help='also keep the computed curves in the results store')
+    args = parser.parse_args()
+
+    print('Analyzing wells...')
+    wells = readManifest(args.manifest)
+    for well in wells:
+        well['store'] = args.store is not None
+        well['curves'] = args.curves and well['store']
+    results = runBatch(wells, args.processes, args.cycles is not None, args.cycles or 0)
+    writeResults(args.results, results)
+    if args.store is not None:
+        with ResultStore(args.store) as store:
+            store.addResults(results)
+    failed = [r['well'] for r in results if r['status'] != 'ok']
+    print('done: {} wells, {} failed {}'.format(len(results), len(failed), failed if failed else ''))
+
+########################################################################################################################
@@ -0,0 +1,223 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+# Times and memory-profiles the pipeline stages on synthetic DFIT records with known closure.
+#
+# Usage: python Benchmark.py results.json [--sizes 1e3 1e4 1e5 1e6] [--dwindows 10 50] [--rate 1] [--noise 0.1]
+#                                         [--tp 518] [--load-limit 1e6] [--plot-limit 1e6]
+#        python Benchmark.py --compare old.json new.json
+########################################################################################################################
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from DFITAnalysis import DFITAnalysis
+from BCAnalysis import BCAnalysis
+from GFunction import GFunction
+from SuareRoot import SquareRoot
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def syntheticDFIT(n, rate=1.0, noise=0.1, tp=None, seed=0):
+    """Generates a synthetic injection/falloff record of n samples at rate samples per second. During the falloff the
+    pressure is linear in G (normal leakoff, G.dp/dG on a line through origin) until closure at 30% of the falloff,
+    after which dp/dG decays as 1/G. Gaussian noise with a standard deviation of noise psi is added. Returns the time,
+    pressure and rate arrays, the injection time (10% of the record unless given) and the known closure as
+    dict(G, pClosure, tClosure [hrs])."""
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / rate
+    tp = 0.1 * t[-1] if tp is None else tp
+    if t[-1] <= 2 * tp:
+        raise ValueError('Record of {} samples at {} Hz is too short for tp = {} s'.format(n, rate, tp))
+
+    pInitial, pIsip, slope = 4600.0, 8000.0, 1150.0  # psi, psi, psi per unit G
+    r = np.where(t < tp, 10.0, 0.0)  # bpm
+
+    tD = np.maximum(t - tp, 0) / tp
+    G = GFunction.gFunction(tD)
+    Gc = GFunction.gFunction(0.3 * (t[-1] - tp) / tp)
+    pc = pIsip - slope * Gc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = np.where(G < Gc, pIsip - slope * G, pc - slope * Gc * np.log(G / Gc))
+    p = np.where(t < tp, pInitial + (pIsip - pInitial) * t / tp, p) + rng.normal(0, noise, n)
+
+    closure = dict(G=float(Gc), pClosure=float(pc), tClosure=float(0.3 * (t[-1] - tp) / 3600))
+    return t, p, r, tp, closure
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def measure(func, memory):
+    """Runs func and returns its result with wall time, CPU time and (if memory) the peak of memory allocated"""
+
+    if memory:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = func()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, dict(wall=wall, cpu=cpu, peak_bytes=peak)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def stages(n, dwindow, args, csvfile):
+    """Pipeline stages for one size and window as (name, function) pairs, functions run in order"""
+
+    t, p, r, tp, closure = syntheticDFIT(n, args.rate, args.noise, args.tp)
+    well = DFITAnalysis.fromArrays(t, p, r, tp)
+    G = GFunction.gFunction(well.tD)
+    out = []
+
+    if n <= args.load_limit:
+        np.savetxt(csvfile, np.column_stack((t, p, r)), delimiter=',', fmt='%.6f', header='t,p,r')
+        out.append(('load', lambda: DFITAnalysis(csvfile, 1, 0, 1, 2, tp, plot=False)))
+    out.append(('smoothDerivative', lambda: BCAnalysis.smoothDerivative(G, well.p_shut, dwindow)))
+
+    gf, sr = GFunction(), SquareRoot()
+    out.append(('GFunction.analysis', lambda: gf.analysis(well, dwindow)))
+    out.append(('SquareRoot.analysis', lambda: sr.analysis(well, dwindow)))
+    out.append(('GFunction.autoIdentifyClosure', lambda: gf.autoIdentifyClosure(well, verbose=False)))
+    out.append(('SquareRoot.autoIdentifyClosure', lambda: sr.autoIdentifyClosure(well, verbose=False)))
+    if n <= args.plot_limit:
+        out.append(('GFunction.plotData', lambda: (gf.plotData(well, 0, 0, 0, 0, 0, 0, 0, 0), gf.fig.canvas.draw())))
+        out.append(('SquareRoot.plotData', lambda: (sr.plotData(well, 0, 0, 0, 0, 0, 0, 0, 0), sr.fig.canvas.draw())))
+    return out, closure, gf, sr
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def accuracy(n, dwindow, args):
+    """Largest departure of the fast derivatives from the reference, relative to the largest reference derivative:
+    sweepDerivative against smoothDerivative on G, and windowedDerivative (1000 dwindow/n either side in log of tD)
+    against a direct least square fit of the windows of 100 points picked at random"""
+
+    t, p, r, tp, _ = syntheticDFIT(n, args.rate, args.noise, args.tp)
+    well = DFITAnalysis.fromArrays(t, p, r, tp)
+    G = GFunction.gFunction(well.tD)
+    reference = BCAnalysis.smoothDerivative(G, well.p_shut, dwindow)
+    sweep = BCAnalysis.sweepDerivative(G, well.p_shut, [dwindow])[0]
+
+    with np.errstate(divide='ignore'):
+        W = np.log(well.tD)
+    halfwidth = 1e3 * dwindow / n
+    windowed = BCAnalysis.windowedDerivative(G, well.p_shut, W, halfwidth)
+    defined = np.flatnonzero(windowed > 0)
+    points = np.random.default_rng(0).choice(defined, min(100, defined.size), replace=False)
+    direct = np.zeros(points.size)
+    for k, i in enumerate(points):
+        window = slice(np.searchsorted(W, W[i] - halfwidth, side='left'),
+                       np.searchsorted(W, W[i] + halfwidth, side='right'))
+        x, y = G[window] - G[window][0], well.p_shut[window]
+        direct[k] = abs(np.linalg.lstsq(np.column_stack((np.ones_like(x), x)), y, rcond=None)[0][1])
+
+    return dict(n=n, dwindow=dwindow, sweepDerivative=float(np.max(np.abs(sweep - reference)) / np.max(reference)),
+                windowedDerivative=float(np.max(np.abs(windowed[points] - direct)) / np.max(direct))
+                if points.size else np.nan)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def run(args):
+    """Runs the benchmark for all sizes and windows, returns the report as a dict"""
+
+    report = dict(meta=dict(python=platform.python_version(), numpy=np.__version__, matplotlib=matplotlib.__version__,
+                            machine=platform.machine(), processor=platform.processor(), time=time.time(),
+                            rate=args.rate, noise=args.noise, tp=args.tp),
+                  results=[], closures=[], accuracy=[])
+
+    with tempfile.TemporaryDirectory() as folder:
+        for n in (int(float(s)) for s in args.sizes):
+            for dwindow in args.dwindows:
+                csvfile = os.path.join(folder, 'synthetic_{}.csv'.format(n))
+                # Timing and memory are measured in separate passes as tracing allocations slows numpy down
+                for memory in (False, True):
+                    funcs, closure, gf, sr = stages(n, dwindow, args, csvfile)
+                    for name, func in funcs:
+                        try:
+                            _, stats = measure(func, memory)
+                        except Exception as e:
+                            stats = dict(error='{}: {}'.format(type(e).__name__, e))
+                        plt.close('all')
+                        if memory:
+                            row = next(row for row in report['results'] if row['n'] == n and
+                                       row['dwindow'] == dwindow and row['stage'] == name)
+                            row['peak_bytes'] = stats.get('peak_bytes')
+                        else:
+                            report['results'].append(dict(n=n, dwindow=dwindow, stage=name, **stats))
+                            print('{:>10d} {:>5d} {:<32s} {}'.format(n, dwindow, name, ' '.join(
+                                '{}={:.4g}'.format(k, v) if isinstance(v, float) else str(v)
+                                for k, v in stats.items() if v is not None)))
+
+                report['closures'].append(dict(n=n, dwindow=dwindow, known=closure,
+                                               G=dict(pClosure=float(gf.pClosure), tClosure=float(gf.tClosure)),
+                                               SRT=dict(pClosure=float(sr.pClosure), tClosure=float(sr.tClosure))))
+                report['accuracy'].append(accuracy(n, dwindow, args))
+                print('{:>10d} {:>5d} {:<32s} {}'.format(n, dwindow, 'accuracy', ' '.join(
+                    '{}={:.3g}'.format(k, v) for k, v in report['accuracy'][-1].items() if isinstance(v, float))))
+    return report
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def compare(old, new):
+    """Prints the ratio of wall time and peak memory of the new to the old results for every common measurement"""
+
+    key = lambda row: (row['n'], row['dwindow'], row['stage'])
+    oldRows = {key(row): row for row in old['results']}
+    print('{:>10s} {:>5s} {:<32s} {:>10s} {:>10s} {:>7s} {:>7s}'.format('n', 'win', 'stage', 'old [s]', 'new [s]',
+                                                                        'time', 'memory'))
+    for row in new['results']:
+        prev = oldRows.get(key(row))
+        if prev is None or 'wall' not in prev or 'wall' not in row:
+            continue
+        mem = row['peak_bytes'] / prev['peak_bytes'] if row.get('peak_bytes') and prev.get('peak_bytes') else np.nan
+        print('{:>10d} {:>5d} {:<32s} {:>10.4g} {:>10.4g} {:>7.2f} {:>7.2f}'.format(
+            row['n'], row['dwindow'], row['stage'], prev['wall'], row['wall'], row['wall'] / prev['wall'], mem))
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the DFIT analysis pipeline on synthetic data')
+    parser.add_argument('output', nargs='?', help='json file to save the results to')
+    parser.add_argument('--sizes', nargs='+', default=['1e3', '1e4', '1e5', '1e6'], help='numbers of samples')
+    parser.add_argument('--dwindows', nargs='+', type=int, default=[10, 50], help='derivative windows')
+    parser.add_argument('--rate', type=float, default=1.0, help='sampling rate [samples/s]')
+    parser.add_argument('--noise', type=float, default=0.1, help='pressure noise standard deviation [psi]')
+    parser.add_argument('--tp', type=float, default=None, help='injection time [s] (default: 10%% of the record)')
+    parser.add_argument('--load-limit', type=float, default=1e6, help='largest size for which the csv load is timed')
+    parser.add_argument('--plot-limit', type=float, default=1e6, help='largest size for which plotting is timed')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved results')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare(json.load(f), json.load(g))
+        sys.exit()
+    if args.output is None:
+        parser.error('the output file is required')
+
+    results = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+
+########################################################################################################################
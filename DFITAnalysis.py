@@ -13,10 +13,17 @@
 
 ########################################################################################################################
 
+import os
+import json
+import itertools
 import numpy as np
 import matplotlib.pyplot as plt
 from GFunction import GFunction
 from SuareRoot import SquareRoot
+from ACA import ACA
+from StreamBuffer import StreamBuffer
+from Decimation import plotDecimated
+from Profiler import NullProfiler
 
 
 # -------------------------------------------------------------------------------------------------------------------- #
@@ -24,10 +31,21 @@ class DFITAnalysis:
     """Defines the well object and loads the pressure data from the csv file. Plots the pressure and rate vs time."""
 
     # ---------------------------------------------------------------------------------------------------------------- #
-    def __init__(self, filename, skip_rows, t_col, p_col, r_col, tp):
-        """Constructs the class object and loads the data"""
+    def __init__(self, filename, skip_rows, t_col, p_col, r_col, tp, plot=True, cache=False, chunk_rows=None,
+                 profiler=None, results=None, data=None):
+        """Constructs the class object and loads the data. Set plot to False to skip the job plot, e.g. for batch runs
+        on machines without a display. Set cache to True to keep the used columns in a binary file next to the data
+        file for fast re-opening. For files too large for memory, chunk_rows streams the file in chunks of that many
+        rows and keeps only the data from shut-in onwards (cache cannot be used then). A StageProfiler may be given to
+        measure each stage, and a ResultCache to reuse analysis results and closure picks of earlier sessions. With tp
+        None, the injection time is the length of the first pumping period found in the rate (see detectCycles), with
+        time then counted from its start, and only its falloff up to the next injection is analyzed (see segments for
+        the other cycles). Data already in memory may be given as rows of time, pressure and rate instead of a file
+        (see fromArrays)."""
 
         plt.ioff()
+        self.profiler = NullProfiler() if profiler is None else profiler
+        self.results = results
         self.filename = filename
         self.skip_rows = skip_rows
         self.t_col = t_col
@@ -35,21 +53,247 @@ class DFITAnalysis:
         self.r_col = r_col
         self.tp = tp
 
-        self.data = np.loadtxt(filename, delimiter=',', skiprows=skip_rows)
-        self.p = self.data[:, self.p_col]
-        self.t = self.data[:, self.t_col]
-        self.r = self.data[:, self.r_col]
+        # Only the time, pressure and rate columns are loaded (in this order) as rows of the data
+        with self.profiler.stage('load') as record:
+            if data is not None:
+                self.data = np.asarray(data, dtype=float)
+                self.first_row = 0
+            elif chunk_rows:
+                if tp is None:
+                    raise ValueError('The injection time tp must be given to load the file in chunks')
+                if cache:
+                    raise ValueError('The column cache holds the whole file, it cannot be used with chunk_rows')
+                self.data, self.first_row = self.loadShutIn(filename, skip_rows, (t_col, p_col, r_col), tp,
+                                                            chunk_rows)
+            else:
+                self.data = self.loadColumns(filename, skip_rows, (t_col, p_col, r_col), cache)
+                self.first_row = 0  # Row of the file (after skip_rows) of the first loaded sample
+            self.t = self.data[0]
+            self.p = self.data[1]
+            self.r = self.data[2]
 
-        self.tp_row = np.min(np.nonzero(self.t >= tp)[0])
-        self.p_shut = self.p[self.tp_row:-1]
-        self.tD = (self.t[self.tp_row:-1] - tp) / tp
+            self.cycles = None  # Start, shut-in and end rows of the injection cycles, once detected
+            if tp is None:
+                self.cycles = self.detectCycles(self.t, self.r)
+                if np.shape(self.cycles)[0] == 0:
+                    raise ValueError('No injection followed by shut-in found in the rate of {}'.format(filename))
+                # Time from the start of the injection, as for the first of the segments
+                start, shut = self.cycles[0, :2]
+                if self.t[start] != 0:
+                    self.data = np.vstack((self.t - self.t[start], self.p, self.r))
+                    self.t, self.p, self.r = self.data
+                tp = self.tp = float(self.t[shut])
+
+            # With several cycles detected, the falloff ends at the next injection (see segments for the others)
+            end = np.shape(self.t)[0] if self.cycles is None else self.cycles[0, 2]
+            self.tp_row = np.min(np.nonzero(self.t >= tp)[0])
+            self.p_shut = self.p[self.tp_row:end - 1]
+            self.tD = (self.t[self.tp_row:end - 1] - tp) / tp
+            self.buffers = None  # Growable storage for data and tD, created on the first append
+
+            # Shut-in data at full resolution, p_shut and tD differ from these only after resampling
+            self.p_shut_raw = self.p_shut
+            self.tD_raw = self.tD
+            self.resampling = None  # (npoints, spacing) of the resampling
+            record['sizes'].update(data=np.size(self.data), p_shut=np.size(self.p_shut))
 
         # Plot the job plot
-        self.jobPlot(0, 0, 0, 0, 0, 0, 0, 0)
+        self.fig = None
+        if plot:
+            with self.profiler.stage('jobPlot', t=np.size(self.t)):
+                self.jobPlot(0, 0, 0, 0, 0, 0, 0, 0)
 
         # Initialize the analyses
         self.GFunction = GFunction()
         self.SquareRoot = SquareRoot()
+        self.ACA = ACA()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @classmethod
+    def fromArrays(cls, t, p, r, tp=None, **kwargs):
+        """Constructs the well from time [s], pressure and rate arrays instead of a file, e.g. for a segment of a
+        record. Time starts at the start of injection as in the files. Keywords are passed to the constructor, the job
+        plot is skipped unless plot=True is given."""
+
+        kwargs.setdefault('plot', False)
+        return cls(None, 0, 0, 1, 2, tp, data=np.vstack((t, p, r)), **kwargs)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def detectCycles(t, r, threshold=None, min_gap=0):
+        """Finds the injection cycles from the rate in one vectorized pass. Pumping is a rate above threshold (0.1% of
+        the maximum rate by default), so shut-in is where the rate has reached zero, after any taper of the pumps, and
+        the ramp-up of the next injection belongs to its own cycle. Pumping periods separated by less than min_gap
+        seconds, e.g. rate steps or brief stops of a step-rate test, are merged. Returns one row per cycle with the rows
+        of the start of the injection (the last sample before pumping, if any), of shut-in and of the end of the
+        falloff (start of the next cycle or end of the data). Cycles still pumping at the end of the data have no
+        falloff and are left out."""
+
+        t = np.asarray(t)
+        r = np.asarray(r)
+        if threshold is None:
+            threshold = 1e-3 * np.max(r) if np.shape(r)[0] else 0
+        pumping = np.concatenate(([0], (r > threshold).astype(np.int8), [0]))
+        edges = np.diff(pumping)
+        starts = np.flatnonzero(edges == 1)
+        shuts = np.flatnonzero(edges == -1)
+
+        if min_gap > 0 and np.shape(starts)[0] > 1:
+            keep = t[starts[1:]] - t[shuts[:-1]] >= min_gap
+            starts = starts[np.concatenate(([True], keep))]
+            shuts = shuts[np.concatenate((keep, [True]))]
+
+        # The pumps started after the last sample without rate, which is not part of the previous falloff
+        starts = np.maximum(starts - 1, np.concatenate(([0], shuts[:-1])))
+        ends = np.append(starts[1:], np.shape(t)[0])
+        cycles = np.column_stack((starts, shuts, ends))
+        return cycles[shuts < np.shape(t)[0] - 1]
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def segments(self, threshold=None, min_gap=0, **kwargs):
+        """Splits the record into one well per injection cycle (see detectCycles), each with its own time from the
+        start of its injection and tp, so every falloff can be analyzed on its own. Keywords are passed to fromArrays,
+        e.g. the ResultCache. Returns the segments in time order."""
+
+        self.cycles = self.detectCycles(self.t, self.r, threshold, min_gap)
+        segments = []
+        for start, shut, end in self.cycles:
+            t = self.t[start:end] - self.t[start]
+            segments.append(self.fromArrays(t, self.p[start:end], self.r[start:end], float(t[shut - start]), **kwargs))
+        return segments
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def loadColumns(filename, skip_rows, cols, cache=False):
+        """Loads the selected columns of the csv file as rows of an array. With cache, the columns are saved to a
+        sidecar .npy file that is memory mapped on later calls, and rebuilt when the size or modification time of the
+        csv file, skip_rows or the columns change."""
+
+        if not cache:
+            return np.loadtxt(filename, delimiter=',', skiprows=skip_rows, usecols=cols, ndmin=2).T
+
+        stat = os.stat(filename)
+        key = dict(size=stat.st_size, mtime=stat.st_mtime_ns, skip_rows=skip_rows, cols=list(cols))
+        sidecar = filename + '.cols.npy'
+        keyfile = filename + '.cols.json'
+        try:
+            with open(keyfile) as f:
+                if json.load(f) == key:
+                    return np.load(sidecar, mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+
+        # Columns are stored contiguously (one row per column). Files are replaced atomically so that readers never
+        # see a partially written cache.
+        data = np.ascontiguousarray(
+            np.loadtxt(filename, delimiter=',', skiprows=skip_rows, usecols=cols, ndmin=2).T)
+        tmp = '{}.{}.tmp'.format(sidecar, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp, sidecar)
+        tmp = '{}.{}.tmp'.format(keyfile, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(key, f)
+        os.replace(tmp, keyfile)
+        return np.load(sidecar, mmap_mode='r')
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def readChunks(filename, skip_rows, cols, chunk_rows):
+        """Generator reading the selected columns of the csv file, yielding chunks of up to chunk_rows rows with the
+        columns as rows of each chunk"""
+
+        with open(filename) as f:
+            for _ in range(skip_rows):
+                next(f, None)
+            while True:
+                lines = list(itertools.islice(f, chunk_rows))
+                if not lines:
+                    return
+                yield np.loadtxt(lines, delimiter=',', usecols=cols, ndmin=2).T
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def loadShutIn(filename, skip_rows, cols, tp, chunk_rows):
+        """Streams the csv file in chunks and keeps only the rows from the shut-in (first time >= tp) onwards, so the
+        memory needed is set by the falloff length rather than the file size. The kept rows are appended to a growable
+        array (see StreamBuffer), so no chunk is held beyond its own reading and the file is read only once. Time must
+        be the first column. Returns the kept columns as rows and the row number (after skip_rows) of the shut-in."""
+
+        data = None
+        first_row = None
+        row = 0
+        for chunk in DFITAnalysis.readChunks(filename, skip_rows, cols, chunk_rows):
+            n = np.shape(chunk)[1]
+            if first_row is None:
+                shut = np.nonzero(chunk[0] >= tp)[0]
+                if shut.size:
+                    first_row = row + shut[0]
+                    data = StreamBuffer(chunk[:, shut[0]:])
+            else:
+                data.append(chunk)
+            row += n
+
+        if first_row is None:
+            raise ValueError('No data after the injection time tp = {} found in {}'.format(tp, filename))
+        return data.view, first_row
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def append(self, t, p, r):
+        """Appends new gauge samples, e.g. during a live falloff, extending p_shut and tD. The analyses already computed
+        are updated incrementally, so the cost depends on the number of new samples and not on the record length."""
+
+        if self.resampling is not None:
+            raise ValueError('Samples cannot be appended to resampled data, call resample(None) first')
+        if self.tp_row + np.shape(self.tD_raw)[0] < np.shape(self.t)[0] - 1:
+            raise ValueError('Samples cannot be appended after later injection cycles, append to the last segment')
+        if self.buffers is None:
+            self.buffers = StreamBuffer(self.data), StreamBuffer(self.tD)
+
+        nOld = np.shape(self.t)[0]
+        self.data = self.buffers[0].append(np.vstack((np.atleast_1d(t), np.atleast_1d(p), np.atleast_1d(r))))
+        self.t, self.p, self.r = self.data
+        self.p_shut = self.p[self.tp_row:-1]
+        self.tD = self.buffers[1].append((self.t[nOld - 1:-1] - self.tp) / self.tp)
+        self.p_shut_raw = self.p_shut
+        self.tD_raw = self.tD
+
+        for analysis in (self.GFunction, self.SquareRoot, self.ACA):
+            if analysis.dwindow is not None:
+                analysis.update(self)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def resample(self, npoints, spacing='log'):
+        """Replaces p_shut and tD by their averages over npoints bins evenly spaced in log(tD) ('log') or in the
+        G-function ('G'), so the analyses run on a few thousand points instead of every raw sample. Bins are averaged
+        rather than subsampled, empty bins are dropped and the shut-in sample keeps a bin of its own. The raw data stays
+        in p_shut_raw and tD_raw. npoints=None restores the raw data. Analyses must be run again afterwards."""
+
+        tD, p = self.tD_raw, self.p_shut_raw
+        if npoints is None or np.shape(tD)[0] <= npoints:
+            self.p_shut, self.tD = p, tD
+            self.resampling = None
+            return
+
+        if spacing == 'log':
+            with np.errstate(divide='ignore'):
+                v = np.log(tD)
+        elif spacing == 'G':
+            v = GFunction.gFunction(tD)
+        else:
+            raise ValueError('Unknown spacing {}, use log or G'.format(spacing))
+
+        # Bin 0 holds the samples at shut-in (log(0) = -inf), the others are evenly spaced up to the last sample
+        finite = np.isfinite(v) & (tD > 0)
+        vmin = np.min(v[finite])
+        edges = np.linspace(vmin, v[-1], npoints)
+        bins = np.where(finite, np.clip(np.searchsorted(edges, v, side='right'), 1, npoints - 1), 0)
+
+        counts = np.bincount(bins, minlength=npoints)
+        used = counts > 0
+        self.tD = np.bincount(bins, weights=tD, minlength=npoints)[used] / counts[used]
+        self.p_shut = np.bincount(bins, weights=p, minlength=npoints)[used] / counts[used]
+        self.resampling = (npoints, spacing)
 
     # ---------------------------------------------------------------------------------------------------------------- #
     def jobPlot(self, xmin, xmax, y1min, y1max, y2min, y2max, y3min, y3max):
@@ -58,11 +302,12 @@ class DFITAnalysis:
         self.fig, yaxis1 = plt.subplots()
         yaxis2 = yaxis1.twinx()
 
-        p1, = yaxis1.plot(self.t / 3600, self.p, 'b-')
-        p2, = yaxis2.plot(self.t / 3600, self.r, 'r-')
+        p1 = plotDecimated(yaxis1, self.t / 3600, self.p, 'b-')
+        p2 = plotDecimated(yaxis2, self.t / 3600, self.r, 'r-')
 
         self.fig.suptitle('Job Plot')
-        self.fig.canvas.set_window_title('JobPlot')
+        if self.fig.canvas.manager is not None:  # No window without a gui backend
+            self.fig.canvas.manager.set_window_title('JobPlot')
         yaxis1.set_xlabel('Time [hrs]')
         yaxis1.set_ylabel('Pressure [psi]')
         yaxis2.set_ylabel('Rate [bpm]')
@@ -87,19 +332,53 @@ class DFITAnalysis:
         plt.draw()
 
     # ---------------------------------------------------------------------------------------------------------------- #
-    def runAll(self, dwindow):
-        """Runs all analyses and plots"""
+    def compute(self, dwindow, window='index', aca_dwindow=0.1):
+        """Runs all analyses without creating any figure and returns the computed arrays. Results (and closure picks)
+        found in the result cache are restored instead of being computed. See GFunction.analysis for window, the after
+        closure derivatives are smoothed over aca_dwindow either side in natural log of time."""
+
+        for analysis in (self.GFunction, self.SquareRoot):
+            if self.results is not None and self.results.load(self, analysis, dwindow, window):
+                continue
+            analysis.analysis(self, dwindow, window)  # Profiled in stages by the analysis
+            if self.results is not None:
+                self.results.save(self, analysis, dwindow, window)
+
+        if self.results is None or not self.results.load(self, self.ACA, aca_dwindow):
+            self.ACA.analysis(self, aca_dwindow)
+            if self.results is not None:
+                self.results.save(self, self.ACA, aca_dwindow)
+
+        return dict(G=self.GFunction.G, dG=self.GFunction.dG, GdG=self.GFunction.GdG,
+                    St=self.SquareRoot.St, dSt=self.SquareRoot.dSt, StdSt=self.SquareRoot.StdSt,
+                    T=self.ACA.T, tdp=self.ACA.tdp, slope=self.ACA.slope)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def runAll(self, dwindow, auto=False, window='index', aca_dwindow=0.1, volume=None):
+        """Runs all analyses and plots. Closure is picked by the user unless auto is True. The after closure flow
+        regimes are then searched from the G-function closure time, with the injected volume [bbl] integrated from the
+        rate unless given (required for chunked loads)."""
 
-        self.GFunction.analysis(self, dwindow)
-        self.GFunction.plotData(self, 0, 0, 0, 0, 0, 4000, 0, 4000)
-        self.GFunction.identifyClosure(self)
+        self.compute(dwindow, window, aca_dwindow)
 
-        self.SquareRoot.analysis(self, dwindow)
-        self.SquareRoot.plotData(self, 0, 0, 0, 0, 0, 4000, 0, 4000)
-        self.SquareRoot.identifyClosure(self)
+        for name, analysis in (('GFunction', self.GFunction), ('SquareRoot', self.SquareRoot)):
+            with self.profiler.stage(name + '.plotData', p_shut=np.size(self.p_shut)):
+                analysis.plotData(self, 0, 0, 0, 0, 0, 4000, 0, 4000)
+            # Includes the time waiting for the user to pick closure
+            with self.profiler.stage(name + '.identifyClosure'):
+                if auto:
+                    analysis.autoIdentifyClosure(self)
+                else:
+                    analysis.identifyClosure(self)
+            if self.results is not None:
+                self.results.save(self, analysis, dwindow, window)
 
-        # TODO: Future features for after closure analysis
-        # self.ACASoliman.analysis(self, dwindow)
+        with self.profiler.stage('ACA.identifyRegimes'):
+            self.ACA.identifyRegimes(self, self.GFunction.tClosure, volume)
+        with self.profiler.stage('ACA.plotData', p_shut=np.size(self.p_shut)):
+            self.ACA.plotData(self, 0, 0, 0, 0, 0, 0)
+        if self.results is not None:
+            self.results.save(self, self.ACA, aca_dwindow)
 
         # Following line prevents the program from quiting until all plots are closed.
         plt.show()
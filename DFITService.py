@@ -0,0 +1,361 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+# Local HTTP service running the G-function, square root time and after closure analyses of uploaded csv files.
+#
+# Usage: python DFITService.py [--port 8050] [--workers N] [--queue 16]
+#
+#   POST /jobs?[tp=518&t_col=1&p_col=2&r_col=3&skip_rows=1&dwindow=10&window=index&aca_dwindow=0.1]
+#        body: the csv file, e.g. curl --data-binary @DFITData.csv "http://127.0.0.1:8050/jobs?tp=518"
+#        202 with the job id, or 503 when the queue is full (retry later)
+#   GET  /jobs/<id>            status, progress and results (once done) as json
+#   GET  /jobs/<id>/events     progress stream, one json line per stage until the job ends
+#   GET  /jobs/<id>/<plot>.png rendered plots: jobplot, gfunction, squareroot and aca
+# Column numbers start at 1 as in Well_1Analysis.py, tp is detected from the rate if not given. The service only
+# listens on localhost.
+########################################################################################################################
+
+import os
+import json
+import uuid
+import asyncio
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+# Parameters of a job with their type and default
+JOB_PARAMS = dict(tp=(float, None), t_col=(int, 1), p_col=(int, 2), r_col=(int, 3), skip_rows=(int, 1),
+                  dwindow=(float, 10), window=(str, 'index'), aca_dwindow=(float, 0.1))
+
+PLOTS = ('jobplot', 'gfunction', 'squareroot', 'aca')
+
+STATUS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          411: 'Length Required', 413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+_progress = None  # Queue for the progress of the jobs, set in each worker process
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def initWorker(progress):
+    """Initializes a worker process: progress is sent to the queue"""
+
+    global _progress
+    _progress = progress
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def runJob(job, data, params):
+    """Analyzes one uploaded csv file in a worker process: loads it, computes all analyses, picks closure
+    automatically, identifies the after closure flow regimes and renders the plots (with the figure templates of the
+    worker). Returns the results dict and the png bytes of the plots."""
+
+    from DFITAnalysis import DFITAnalysis
+    from ReportRenderer import renderer
+
+    def progress(stage):
+        if _progress is not None:
+            _progress.put((job, stage))
+
+    fd, filename = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        progress('loading')
+        well = DFITAnalysis(filename, params['skip_rows'], params['t_col'] - 1, params['p_col'] - 1,
+                            params['r_col'] - 1, params['tp'], plot=False)
+        dwindow = int(params['dwindow']) if params['window'] == 'index' else params['dwindow']
+
+        progress('computing')
+        well.compute(dwindow, params['window'], params['aca_dwindow'])
+
+        results = dict(tp=float(well.tp))
+        for key, analysis in (('G', well.GFunction), ('SRT', well.SquareRoot)):
+            progress('closure ' + key)
+            analysis.autoIdentifyClosure(well, verbose=False)
+            results[key] = dict(pClosure=float(analysis.pClosure), tClosure=float(analysis.tClosure),
+                                slope=float(analysis.closureSlope), residual=float(analysis.closureResidual))
+
+        progress('after closure')
+        well.ACA.identifyRegimes(well, well.GFunction.tClosure, verbose=False)
+        results['ACA'] = {name: getattr(well.ACA, name) for name in
+                          ('volume', 'pReservoir', 'khmu', 'radialStart', 'radialEnd', 'linearStart', 'linearEnd')}
+
+        progress('rendering')
+        return results, renderer().pngs(well)
+    finally:
+        os.remove(filename)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class DFITService:
+    """Asyncio HTTP server queuing the uploaded jobs and running them in a pool of worker processes, so the event loop
+    only handles requests. At most queue_size jobs wait for a worker, further uploads are refused (503) until the
+    queue drains. The last max_jobs finished jobs are kept for their results to be fetched."""
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self, workers=None, queue_size=16, max_jobs=100, max_upload=256 << 20):
+        """Constructs the service, workers defaults to one per core"""
+
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_jobs = max_jobs
+        self.max_upload = max_upload  # Largest accepted upload in bytes
+        self.jobs = OrderedDict()  # Jobs by id, in order of submission
+        self.queue = None  # Jobs waiting for a worker
+        self.pool = None
+        self.progress = None  # Progress sent by the workers
+        self.loop = None
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    async def serve(self, host='127.0.0.1', port=8050):
+        """Runs the service until cancelled"""
+
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.queue_size)
+        self.progress = multiprocessing.Queue()
+        self.pool = ProcessPoolExecutor(self.workers, initializer=initWorker, initargs=(self.progress,))
+        reader = threading.Thread(target=self.readProgress, daemon=True)
+        reader.start()
+        dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            self.progress.put(None)
+            self.pool.shutdown(cancel_futures=True)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def readProgress(self):
+        """Forwards the progress of the workers to the event loop (runs in a thread, as the queue blocks)"""
+
+        while True:
+            message = self.progress.get()
+            if message is None:
+                return
+            self.loop.call_soon_threadsafe(self.update, *message)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def submit(self, data, params):
+        """Queues a job, returns it or None if the queue is full"""
+
+        if self.queue.full():
+            return None
+        job = dict(id=uuid.uuid4().hex, status='queued', params=params, events=[], results=None, images={},
+                   error=None, changed=asyncio.Event(), data=data)
+        self.jobs[job['id']] = job
+        self.queue.put_nowait(job)
+        self.update(job['id'], 'queued')
+        return job
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def update(self, job_id, stage, **info):
+        """Records a progress event of the job and wakes up the clients streaming it"""
+
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job['events'].append(dict(stage=stage, **info))
+        job['changed'].set()
+        job['changed'] = asyncio.Event()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    async def dispatch(self):
+        """Runs the queued jobs one at a time in the worker pool"""
+
+        while True:
+            job = await self.queue.get()
+            job['status'] = 'running'
+            data = job.pop('data')
+            try:
+                job['results'], job['images'] = await self.loop.run_in_executor(self.pool, runJob, job['id'], data,
+                                                                                job['params'])
+                job['status'] = 'done'
+                self.update(job['id'], 'done')
+            except Exception as e:
+                job['status'] = 'failed'
+                job['error'] = '{}: {}'.format(type(e).__name__, e)
+                self.update(job['id'], 'failed', error=job['error'])
+            self.evict()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def evict(self):
+        """Forgets the oldest finished jobs beyond max_jobs"""
+
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(len(finished) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def parseParams(query):
+        """Job parameters from the query string, raises ValueError for invalid ones"""
+
+        values = {key: value[-1] for key, value in parse_qs(query).items()}
+        params = {}
+        for name, (kind, default) in JOB_PARAMS.items():
+            params[name] = kind(values[name]) if name in values else default
+        if params['window'] not in ('index', 'x', 'log'):
+            raise ValueError('Unknown derivative window {}, use index, x or log'.format(params['window']))
+        return params
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    async def handle(self, reader, writer):
+        """Serves one HTTP request (the connection is closed after the response)"""
+
+        try:
+            request = await reader.readline()
+            method, target, _ = request.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except (ValueError, ConnectionError):
+            writer.close()
+            return
+
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if parts == ['jobs'] and method == 'POST':
+                await self.postJob(reader, writer, headers, url.query)
+            elif len(parts) >= 2 and parts[0] == 'jobs' and method == 'GET':
+                job = self.jobs.get(parts[1])
+                if job is None:
+                    self.respond(writer, 404, dict(error='Unknown job'))
+                elif len(parts) == 2:
+                    self.respond(writer, 200, self.jobStatus(job))
+                elif parts[2:] == ['events']:
+                    await self.streamEvents(writer, job)
+                elif len(parts) == 3 and parts[2].endswith('.png') and parts[2][:-4] in job['images']:
+                    self.respond(writer, 200, job['images'][parts[2][:-4]], 'image/png')
+                else:
+                    self.respond(writer, 404, dict(error='Not found'))
+            elif parts and parts[0] == 'jobs':
+                self.respond(writer, 405, dict(error='Method not allowed'))
+            else:
+                self.respond(writer, 404, dict(error='Not found'))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    async def postJob(self, reader, writer, headers, query):
+        """Accepts an uploaded csv file as a new job"""
+
+        if 'content-length' not in headers:
+            self.respond(writer, 411, dict(error='Content-Length is required'))
+            return
+        if not headers['content-length'].isdigit():
+            self.respond(writer, 400, dict(error='Content-Length must be a non-negative integer'))
+            return
+        length = int(headers['content-length'])
+        try:
+            params = self.parseParams(query)
+        except ValueError as e:
+            self.respond(writer, 400, dict(error=str(e)))
+            return
+        if length > self.max_upload:
+            self.respond(writer, 413, dict(error='Upload larger than {} bytes'.format(self.max_upload)))
+            return
+        # Refused before reading the upload, so clients are slowed down rather than the server filling up
+        if self.queue.full():
+            self.respond(writer, 503, dict(error='Too many jobs queued, retry later'), headers={'Retry-After': '5'})
+            return
+
+        try:
+            data = await reader.readexactly(length)
+        except asyncio.IncompleteReadError as e:
+            self.respond(writer, 400, dict(error='Upload ended after {} of {} bytes'.format(len(e.partial), length)))
+            return
+        job = self.submit(data, params)
+        if job is None:
+            self.respond(writer, 503, dict(error='Too many jobs queued, retry later'), headers={'Retry-After': '5'})
+        else:
+            self.respond(writer, 202, dict(id=job['id'], status=job['status']),
+                         headers={'Location': '/jobs/' + job['id']})
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def jobStatus(job):
+        """Json view of a job"""
+
+        status = dict(id=job['id'], status=job['status'], params=job['params'], events=job['events'])
+        if job['status'] == 'done':
+            status['results'] = job['results']
+            status['plots'] = ['/jobs/{}/{}.png'.format(job['id'], name) for name in PLOTS if name in job['images']]
+        if job['error'] is not None:
+            status['error'] = job['error']
+        return status
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    async def streamEvents(self, writer, job):
+        """Streams the progress events of the job (chunked, one json line per event) until it is done or failed"""
+
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n'
+                     b'Cache-Control: no-cache\r\nConnection: close\r\n\r\n')
+        sent = 0
+        while True:
+            changed = job['changed']
+            for event in job['events'][sent:]:
+                line = (json.dumps(event) + '\n').encode()
+                writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+            sent = len(job['events'])
+            await writer.drain()
+            if job['status'] in ('done', 'failed'):
+                break
+            await changed.wait()
+        writer.write(b'0\r\n\r\n')
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def respond(writer, code, body, content_type='application/json', headers=None):
+        """Writes a complete response, body is bytes or an object sent as json"""
+
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        head = ['HTTP/1.1 {} {}'.format(code, STATUS[code]), 'Content-Type: ' + content_type,
+                'Content-Length: {}'.format(len(body)), 'Connection: close']
+        head += ['{}: {}'.format(name, value) for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local HTTP service for DFIT analyses')
+    parser.add_argument('--port', type=int, default=8050, help='port on localhost to listen on')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('--queue', type=int, default=16, help='number of jobs that may wait for a worker')
+    args = parser.parse_args()
+
+    print('Serving on http://127.0.0.1:{}/jobs'.format(args.port))
+    try:
+        asyncio.run(DFITService(args.workers, args.queue).serve(port=args.port))
+    except KeyboardInterrupt:
+        pass
+
+########################################################################################################################
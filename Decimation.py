@@ -0,0 +1,72 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def minMaxDecimate(x, y, buckets):
+    """Reduces the data to the first and last points and the minimum and maximum of y in each of the buckets (in their
+    original order), so spikes survive the decimation. Buckets are evenly spaced in x (sorted ascending), so features
+    keep their place on the plot however unevenly the data is sampled, and empty buckets are skipped. Data with less
+    than two points per bucket is returned as is."""
+
+    n = np.shape(y)[0]
+    if n <= 2 * buckets:
+        return x, y
+
+    edges = np.searchsorted(x, np.linspace(x[0], x[-1], buckets + 1), side='left')
+    edges[-1] = n
+    start = edges[:-1][edges[:-1] < edges[1:]]  # First point of the non-empty buckets
+    bucket = np.repeat(np.arange(np.shape(start)[0]), np.diff(np.append(start, n)))
+
+    def first(match):
+        """First index of each bucket where match is True"""
+        idx = np.flatnonzero(match)
+        return idx[np.concatenate(([True], bucket[idx[1:]] != bucket[idx[:-1]]))]
+
+    imin = first(y == np.fmin.reduceat(y, start)[bucket])
+    imax = first(y == np.fmax.reduceat(y, start)[bucket])
+    idx = np.concatenate(([0], np.union1d(imin, imax), [n - 1]))
+    return x[idx], y[idx]
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def plotDecimated(axes, x, y, fmt):
+    """Plots y vs x (x sorted ascending) decimated to one bucket per pixel of the axes width. The visible range is
+    decimated again whenever the x-limits change (zoom/pan), so drawing cost depends on the screen and not on the
+    number of points. Returns the line."""
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = np.shape(x)[0]
+
+    def buckets():
+        return max(int(axes.bbox.width), 100)
+
+    line, = axes.plot(*minMaxDecimate(x, y, buckets()), fmt)
+    if n <= 2 * buckets():
+        return line
+
+    def update(ax):
+        xmin, xmax = ax.get_xlim()
+        lo = max(np.searchsorted(x, xmin, side='left') - 1, 0)
+        hi = min(np.searchsorted(x, xmax, side='right') + 1, n)
+        line.set_data(*minMaxDecimate(x[lo:hi], y[lo:hi], buckets()))
+
+    axes.callbacks.connect('xlim_changed', update)
+    return line
+
+########################################################################################################################
@@ -17,12 +17,16 @@ import numpy as np
 from math import pi
 import matplotlib.pyplot as plt
 from BCAnalysis import BCAnalysis
+from StreamBuffer import StreamBuffer
+from Decimation import plotDecimated
 
 
 # -------------------------------------------------------------------------------------------------------------------- #
 class GFunction(BCAnalysis):
     """Class inherits from Analysis and defines functions specific to G-Function analysis."""
 
+    arrays = ('G', 'dG', 'GdG')
+
     # ---------------------------------------------------------------------------------------------------------------- #
     def __init__(self):
         """Constructor instantiates the variables to be used"""
@@ -33,13 +37,57 @@ class GFunction(BCAnalysis):
         self.GdG = None  # Log derivative of pressure = G.dp/dG
 
     # ---------------------------------------------------------------------------------------------------------------- #
-    def analysis(self, well, dwindow):
-        """Computes G - Function and derivative """
-
-        tD = well.tD
-        self.G = 4 / pi * 4 / 3 * (np.power((1 + tD), 3 / 2) - np.power(tD, 3 / 2) - 1)
-        self.dG = super().smoothDerivative(self.G, well.p_shut, dwindow)
+    def analysis(self, well, dwindow, window='index'):
+        """Computes G - Function and derivative. Returns G, dp/dG and G.dp/dG. The derivative window is dwindow points
+        either side by default, or dwindow either side in G (window='x') or in ln(tD) (window='log') for irregularly
+        sampled data. The G-function evaluation and the derivative are stages of the profiler of the well."""
+
+        self.dwindow = dwindow
+        self.window = window
+        self.buffers = None
+        with well.profiler.stage('GFunction.gFunction', tD=np.size(well.tD)):
+            self.G = self.gFunction(well.tD)
+        with well.profiler.stage('GFunction.derivative', p_shut=np.size(well.p_shut)):
+            self.dG = super().derivative(self.G, well.p_shut, well.tD)
         self.GdG = self.G * self.dG
+        return self.G, self.dG, self.GdG
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def gFunction(tD):
+        """G-function of dimensionless time"""
+
+        return 4 / pi * 4 / 3 * (np.power((1 + tD), 3 / 2) - np.power(tD, 3 / 2) - 1)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def inverseGFunction(G, tD=None):
+        """Dimensionless time of the G-function by Newton iterations from the guess tD (G is monotone and concave in
+        tD). Without a guess, starts from the large time asymptote G = 8/pi.tD^0.5."""
+
+        G = np.asarray(G, dtype=float)
+        tD = (pi * G / 8) ** 2 if tD is None else np.asarray(tD, dtype=float)
+        for _ in range(50):
+            step = (GFunction.gFunction(tD) - G) / (8 / pi * (np.sqrt(1 + tD) - np.sqrt(tD)))
+            tD = np.maximum(tD - step, 0)
+            if np.all(np.abs(step) <= 1e-12 * (1 + tD)):
+                break
+        return tD
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def update(self, well):
+        """Extends G - Function and derivative to the samples appended to the well, only the derivative windows touched
+        by the new samples are recomputed"""
+
+        nOld = np.shape(self.G)[0]
+        if self.buffers is None:
+            self.buffers = StreamBuffer(self.G), StreamBuffer(self.dG), StreamBuffer(self.GdG)
+        tD = well.tD[nOld:]
+        self.G = self.buffers[0].append(self.gFunction(tD))
+        self.dG = self.buffers[1].append(np.zeros_like(tD))
+        self.GdG = self.buffers[2].append(np.zeros_like(tD))
+        lo = super().extendDerivative(self.G, well.p_shut, self.dG, nOld, well.tD)
+        self.GdG[lo:] = self.G[lo:] * self.dG[lo:]
 
     # ---------------------------------------------------------------------------------------------------------------- #
     def plotData(self, well, xmin, xmax, y1min, y1max, y2min, y2max, y3min, y3max):
@@ -50,11 +98,12 @@ class GFunction(BCAnalysis):
         self.stLnPlot = None
         self.clsrPtPlot = None
 
-        self.pressPlot, = self.yaxis1.plot(self.G, well.p_shut, 'b-')
-        self.logDerPlot, = self.yaxis2.plot(self.G, self.GdG, 'r-')
-        self.derPlot, = self.yaxis3.plot(self.G, self.dG, 'g-')
+        self.pressPlot = plotDecimated(self.yaxis1, self.G, well.p_shut, 'b-')
+        self.logDerPlot = plotDecimated(self.yaxis2, self.G, self.GdG, 'r-')
+        self.derPlot = plotDecimated(self.yaxis3, self.G, self.dG, 'g-')
 
-        self.fig.canvas.set_window_title('G-Function')
+        if self.fig.canvas.manager is not None:  # No window without a gui backend
+            self.fig.canvas.manager.set_window_title('G-Function')
         self.fig.suptitle('G-Function Plot')
         self.yaxis1.set_xlabel('G-Function')
         self.yaxis1.set_ylabel('Pressure [psi]')
@@ -71,14 +120,50 @@ class GFunction(BCAnalysis):
         to console"""
 
         super().identifyClosure(well)
-        # TODO: Implement a better way/interpolation to get closure pressure and time
-        idx = np.argmin(np.abs(self.G - self.xClosure))
-        self.pClosure = well.p_shut[idx]
-        idx = np.argmin(np.abs(well.p - self.pClosure))
-        self.tClosure = (well.t[idx] - well.tp) / 3600
+        self.closure(well)
         super().annotateClosure()
         print('G-Function Analysis Results')
         print('Closure Pressure = {pc:.1f} psi '.format(pc=self.pClosure))
         print('Closure Time (after s/i) = {tc:.2f} hrs '.format(tc=self.tClosure))
 
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def autoIdentifyClosure(self, well, verbose=True):
+        """Identifies closure without user input from the departure of G.dp/dG from the straight line through origin.
+        Annotates the figure if there is one and prints closure pressure and time to console"""
+
+        super().autoIdentifyClosure(self.G, self.GdG)
+        self.closure(well)
+        if self.fig is not None:
+            super().annotateClosure()
+        if verbose:
+            print('G-Function Analysis Results (automatic)')
+            print('Closure Pressure = {pc:.1f} psi '.format(pc=self.pClosure))
+            print('Closure Time (after s/i) = {tc:.2f} hrs '.format(tc=self.tClosure))
+            print('Relative residual of line through origin = {res:.3f} '.format(res=self.closureResidual))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def closure(self, well):
+        """Computes closure pressure and time from the closure point on the G-function scale"""
+
+        self.pClosure, self.tClosure = self.closureAt(well, self.xClosure)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def closureAt(self, well, xClosure):
+        """Returns closure pressure and time for a closure point on the G-function scale"""
+
+        # Time from the G-function, interpolated from the analysis arrays and refined to the exact inverse, then the
+        # pressure interpolated between the raw shut-in samples either side of it. Both are binary searches, O(log n).
+        tD = self.inverseGFunction(xClosure, super().interpolateSorted(self.G, well.tD, xClosure))
+        return super().interpolateSorted(well.tD_raw, well.p_shut_raw, tD), float(tD) * well.tp / 3600
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def sweep(self, well, dwindows):
+        """Picks closure automatically for each of the derivative windows, with the derivatives of all windows read
+        from one set of block sums (see sweepDerivative). Returns the picks per window and the spread of closure
+        pressure and time."""
+
+        if self.G is None:
+            self.G = self.gFunction(well.tD)
+        return super().sweepClosure(well, self.G, well.p_shut, dwindows)
+
 ########################################################################################################################
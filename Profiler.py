@@ -0,0 +1,128 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+
+import json
+import time
+import tracemalloc
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class StageProfiler:
+    """Records wall time, CPU time, peak memory and array sizes of the named stages of a run"""
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self, memory=True):
+        """Constructs the profiler. Memory tracing (tracemalloc) slows numpy down, set memory to False to only time."""
+
+        self.memory = memory
+        self.records = []  # One dict per stage run, in order
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def stage(self, name, **sizes):
+        """Context manager measuring the stage. Yields the record of the stage, sizes of arrays (number of elements)
+        may be given as keywords or added to record['sizes'] within the stage. Stages should not be nested."""
+
+        return _Stage(self, name, sizes)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def report(self):
+        """Returns the measurements as a dict with the stages in order and the total time per stage name"""
+
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], dict(calls=0, wall=0.0, cpu=0.0))
+            total['calls'] += 1
+            total['wall'] += record['wall']
+            total['cpu'] += record['cpu']
+        return dict(stages=self.records, totals=totals)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def toJSON(self, filename=None):
+        """Returns the report as a json string, and saves it if a filename is given"""
+
+        text = json.dumps(self.report(), indent=1)
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(text)
+        return text
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class _Stage:
+    """Context manager of a stage measured by a StageProfiler"""
+
+    def __init__(self, profiler, name, sizes):
+        self.profiler = profiler
+        self.record = dict(stage=name, sizes=dict(sizes))
+
+    def __enter__(self):
+        if self.profiler.memory:
+            self.tracing = tracemalloc.is_tracing()
+            if self.tracing:
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record['wall'] = time.perf_counter() - self.wall
+        self.record['cpu'] = time.process_time() - self.cpu
+        if self.profiler.memory:
+            self.record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            if not self.tracing:
+                tracemalloc.stop()
+        if exc_type is not None:
+            self.record['error'] = '{}: {}'.format(exc_type.__name__, exc_value)
+        self.profiler.records.append(self.record)
+        return False
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class NullProfiler:
+    """Profiler that records nothing, used when instrumentation is switched off"""
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self):
+        self.context = _NullStage()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def stage(self, name, **sizes):
+        """Returns a context manager that does nothing"""
+
+        return self.context
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def report(self):
+        """Returns an empty report"""
+
+        return dict(stages=[], totals={})
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class _NullStage:
+    """Context manager that does nothing, yields a scratch record"""
+
+    def __init__(self):
+        self.record = dict(sizes={})
+
+    def __enter__(self):
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+########################################################################################################################
@@ -0,0 +1,336 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+# Renders the job plot, G-function, square root time and after closure plots of many wells to pdf/png reports, without
+# any window, in parallel worker processes.
+#
+# Usage: python ReportRenderer.py manifest.csv folder [--format pdf png] [--processes N] [--cache folder]
+#
+# The manifest is the one of BatchAnalysis.py. Closure picks saved in the result cache (e.g. picked by hand with runAll)
+# are used when found, otherwise closure is picked automatically.
+########################################################################################################################
+
+import os
+import io
+import argparse
+from functools import partial
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from BCAnalysis import BCAnalysis
+from Decimation import minMaxDecimate
+
+_renderer = None  # Renderer of the worker process, its figure templates are reused for every well
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class ReportRenderer:
+    """Draws the report plots of a well on figure templates built once with the Agg backend. Rendering another well
+    only replaces the data of the lines and the closure marks, so no figure is created or destroyed per well."""
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self, width=8, height=6, dpi=100):
+        """Constructs the renderer with figures of width x height inches"""
+
+        self.size = (width, height)
+        self.dpi = dpi
+        self.buckets = int(width * dpi)  # Decimation of the lines to about one bucket per pixel
+        self.templates = {}  # Figure templates by page name, built on first use
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def figure(self):
+        """Blank figure drawn by its own Agg canvas, independent of pyplot"""
+
+        fig = Figure(figsize=self.size, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        return fig
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def jobTemplate(self):
+        """Job plot: pressure and rate vs time"""
+
+        fig = self.figure()
+        yaxis1 = fig.add_subplot()
+        yaxis2 = yaxis1.twinx()
+        p, = yaxis1.plot([], [], 'b-')
+        r, = yaxis2.plot([], [], 'r-')
+
+        fig.suptitle('Job Plot')
+        yaxis1.set_xlabel('Time [hrs]')
+        yaxis1.set_ylabel('Pressure [psi]')
+        yaxis2.set_ylabel('Rate [bpm]')
+        tkw = dict(size=4, width=1.5)
+        yaxis1.tick_params(axis='x', **tkw)
+        for axes, line in ((yaxis1, p), (yaxis2, r)):
+            axes.tick_params(axis='y', colors=line.get_color(), **tkw)
+            axes.yaxis.label.set_color(line.get_color())
+        return dict(fig=fig, axes=(yaxis1, yaxis2), lines=(p, r))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def closureTemplate(self, title, xlabel, ylabel2, ylabel3):
+        """G-function or square root time plot: the three axes of BCAnalysis with the straight line through origin,
+        the closure line and the closure annotation"""
+
+        fig = self.figure()
+        axes, lines = BCAnalysis.threeAxes(fig)
+        stLn, = axes[1].plot([], [], 'k--')
+        clsrPt, = axes[1].plot([], [], 'k--')
+        # Annotation on the top axes so no line is drawn over it, pointing at the pressure axes data
+        annotation = axes[2].annotate('', xy=(0, 0), **dict(BCAnalysis.annotationStyle, xycoords=axes[0].transData))
+
+        fig.suptitle(title)
+        axes[0].set_xlabel(xlabel)
+        axes[0].set_ylabel('Pressure [psi]')
+        axes[1].set_ylabel(ylabel2)
+        axes[2].set_ylabel(ylabel3)
+        return dict(fig=fig, axes=axes, lines=lines, stLn=stLn, clsrPt=clsrPt, annotation=annotation)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def acaTemplate(self):
+        """After closure plot: log-log pressure and t.dp/dt vs total time"""
+
+        fig = self.figure()
+        yaxis1 = fig.add_subplot()
+        yaxis2 = yaxis1.twinx()
+        p, = yaxis1.loglog([1, 2], [1, 2], 'b-')
+        tdp, = yaxis2.loglog([1, 2], [1, 2], 'r-')
+
+        fig.suptitle('After Closure Analysis Plot')
+        yaxis1.set_xlabel('Total time [hrs]')
+        yaxis1.set_ylabel('Pressure [psi]')
+        yaxis2.set_ylabel('$t.dp/dt$ [psi]')
+        tkw = dict(size=4, width=1.5)
+        yaxis1.tick_params(axis='x', **tkw)
+        for axes, line in ((yaxis1, p), (yaxis2, tdp)):
+            axes.tick_params(axis='y', colors=line.get_color(), **tkw)
+            axes.yaxis.label.set_color(line.get_color())
+        return dict(fig=fig, axes=(yaxis1, yaxis2), lines=(p, tdp), spans=[])
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def template(self, name):
+        """Figure template of the page, built on first use"""
+
+        if name not in self.templates:
+            if name == 'jobplot':
+                self.templates[name] = self.jobTemplate()
+            elif name == 'gfunction':
+                self.templates[name] = self.closureTemplate('G-Function Plot', 'G-Function', '$G.dp/dG$ [psi]',
+                                                            '$dp/dG$ [psi]')
+            elif name == 'squareroot':
+                self.templates[name] = self.closureTemplate('Square Root Time Plot', '$t_D^{0.5}$',
+                                                            '$t_D^{0.5}.dp/dt_D^{0.5}$ [psi]', '$dp/dt_D^{0.5}$ [psi]')
+            else:
+                self.templates[name] = self.acaTemplate()
+        return self.templates[name]
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def rescale(axes, bottom=None):
+        """Fits the axes to their data, also where the limits of the previous well were set by hand"""
+
+        for ax in axes:
+            ax.relim()
+            ax.autoscale(True)
+        if bottom is not None:
+            for ax in axes[1:]:
+                ax.set_ylim(bottom=bottom)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def drawJob(self, well):
+        """Job plot of the well"""
+
+        page = self.template('jobplot')
+        p, r = page['lines']
+        p.set_data(*minMaxDecimate(well.t / 3600, well.p, self.buckets))
+        r.set_data(*minMaxDecimate(well.t / 3600, well.r, self.buckets))
+        self.rescale(page['axes'])
+        page['axes'][0].set_xlim(left=0)
+        return page['fig']
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def drawClosure(self, name, well, analysis, X, XdYdX, dYdX):
+        """G-function or square root time plot of the well with its closure pick (if any) marked and annotated"""
+
+        page = self.template(name)
+        for line, y in zip(page['lines'], (well.p_shut, XdYdX, dYdX)):
+            line.set_data(*minMaxDecimate(X, y, self.buckets))
+        # The guides of the previous well must not count in the limits
+        page['stLn'].set_data([], [])
+        page['clsrPt'].set_data([], [])
+        self.rescale(page['axes'], bottom=0)
+        page['axes'][0].set_xlim(left=0)
+
+        picked = analysis.xClosure is not None
+        for artist in (page['stLn'], page['clsrPt'], page['annotation']):
+            artist.set_visible(picked)
+        if picked:
+            xmax = page['axes'][1].get_xlim()[1]
+            ymax = page['axes'][1].get_ylim()[1]
+            if analysis.closureSlope is not None:
+                page['stLn'].set_data([0, xmax], [0, analysis.closureSlope * xmax])
+            else:
+                page['stLn'].set_visible(False)  # Picks saved by hand do not keep the straight line
+            page['clsrPt'].set_data([analysis.xClosure, analysis.xClosure], [0, ymax])
+            page['annotation'].set_text(BCAnalysis.closureText(analysis.pClosure, analysis.tClosure))
+            page['annotation'].xy = (analysis.xClosure, analysis.pClosure)
+        return page['fig']
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def drawACA(self, well):
+        """After closure plot of the well with the flow regimes identified shaded"""
+
+        aca = well.ACA
+        page = self.template('aca')
+        yaxis1, yaxis2 = page['axes']
+        defined = aca.tdp > 0
+        page['lines'][0].set_data(aca.T, well.p_shut)
+        page['lines'][1].set_data(aca.T[defined], aca.tdp[defined])
+        for span in page['spans']:
+            span.remove()
+        page['spans'] = []
+        self.rescale(page['axes'])
+
+        tShut = well.tp / 3600
+        for name, color in (('radial', 'g'), ('linear', 'y')):
+            if getattr(aca, name + 'Start', None) is not None:
+                page['spans'].append(yaxis1.axvspan(getattr(aca, name + 'Start') + tShut,
+                                                    getattr(aca, name + 'End') + tShut,
+                                                    color=color, alpha=0.2, label='Pseudo-' + name))
+        legend = yaxis1.get_legend()
+        if legend is not None:
+            legend.remove()
+        if page['spans']:
+            yaxis1.legend(loc='lower left')
+        return page['fig']
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def pages(self, well):
+        """Draws the plots of the computed well one after the other, yields the page name and figure. A figure is
+        reused for the next well, so it must be saved before moving on."""
+
+        yield 'jobplot', self.drawJob(well)
+        gf, sr = well.GFunction, well.SquareRoot
+        yield 'gfunction', self.drawClosure('gfunction', well, gf, gf.G, gf.GdG, gf.dG)
+        yield 'squareroot', self.drawClosure('squareroot', well, sr, sr.St, sr.StdSt, sr.dSt)
+        if well.ACA.T is not None:
+            yield 'aca', self.drawACA(well)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def pngs(self, well):
+        """Returns the plots of the well as png bytes by page name"""
+
+        images = {}
+        for name, fig in self.pages(well):
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png')
+            images[name] = buffer.getvalue()
+        return images
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def render(self, well, basename, formats=('pdf',)):
+        """Writes the report of the well: basename.pdf with one page per plot and/or basename_<page>.png per plot.
+        Returns the files written."""
+
+        files = []
+        pdf = PdfPages(basename + '.pdf') if 'pdf' in formats else None
+        try:
+            for name, fig in self.pages(well):
+                if pdf is not None:
+                    pdf.savefig(fig)
+                if 'png' in formats:
+                    files.append('{}_{}.png'.format(basename, name))
+                    fig.savefig(files[-1])
+        finally:
+            if pdf is not None:
+                pdf.close()
+                files.insert(0, basename + '.pdf')
+        return files
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def renderer():
+    """Renderer of the current process, so the templates are built once per worker"""
+
+    global _renderer
+    if _renderer is None:
+        _renderer = ReportRenderer()
+    return _renderer
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def pickClosure(well, verbose=False):
+    """Picks closure automatically for the analyses without a saved pick, then identifies the after closure flow
+    regimes from the G-function closure if not done yet"""
+
+    for analysis in (well.GFunction, well.SquareRoot):
+        if analysis.xClosure is None:
+            analysis.autoIdentifyClosure(well, verbose=verbose)
+    if well.ACA.T is not None and well.ACA.tClosure is None:
+        well.ACA.identifyRegimes(well, well.GFunction.tClosure, verbose=verbose)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def renderWell(spec, folder, formats=('pdf',), results=None):
+    """Loads, computes and renders the report of one well of the manifest (see BatchAnalysis). Errors are reported in
+    the result instead of being raised so that one bad well does not stop the others."""
+
+    from DFITAnalysis import DFITAnalysis
+
+    result = dict(well=spec['well'], status='ok', error='', files=[])
+    if 'error' in spec:  # Invalid manifest row
+        return dict(result, status='failed', error=spec['error'])
+    try:
+        well = DFITAnalysis(spec['filename'], spec['skip_rows'], spec['t_col'] - 1, spec['p_col'] - 1,
+                            spec['r_col'] - 1, spec['tp'], plot=False, results=results)
+        well.compute(spec['dwindow'])
+        pickClosure(well)
+        result['files'] = renderer().render(well, os.path.join(folder, spec['well']), formats)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    return result
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def renderWells(wells, folder, formats=('pdf',), processes=None, results=None):
+    """Renders the reports of the wells in a pool of processes (one per core by default), returns the results in
+    manifest order. Wells whose worker died are reported as failed (see BatchAnalysis.runJobs)."""
+
+    from BatchAnalysis import runJobs
+
+    os.makedirs(folder, exist_ok=True)
+    return runJobs(partial(renderWell, folder=folder, formats=formats, results=results), wells, processes,
+                   lambda spec, error: dict(well=spec['well'], status='failed', error=error, files=[]))
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+if __name__ == '__main__':
+    from BatchAnalysis import readManifest
+    from ResultCache import ResultCache
+
+    parser = argparse.ArgumentParser(description='Renders DFIT analysis reports of many wells')
+    parser.add_argument('manifest', help='csv file listing the wells and their parameters')
+    parser.add_argument('folder', help='folder to write the reports to')
+    parser.add_argument('--format', nargs='+', choices=('pdf', 'png'), default=['pdf'], help='report formats')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('--cache', default=None, help='result cache folder with saved closure picks')
+    args = parser.parse_args()
+
+    print('Rendering reports...')
+    cache = ResultCache(args.cache) if args.cache else None
+    reports = renderWells(readManifest(args.manifest), args.folder, args.format, args.processes, cache)
+    failed = [r['well'] for r in reports if r['status'] != 'ok']
+    print('done: {} wells, {} failed {}'.format(len(reports), len(failed), failed if failed else ''))
+
+########################################################################################################################
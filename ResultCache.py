@@ -0,0 +1,125 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+
+import os
+import json
+import zipfile
+import hashlib
+import numpy as np
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def fileHash(filename, blocksize=1 << 20):
+    """SHA-256 of the content of the file"""
+
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class ResultCache:
+    """On-disk cache of analysis results (arrays and closure picks) keyed by the content of the data file and the
+    analysis parameters. Entries are single files written atomically, so several processes can share the folder. The
+    least recently used entries are removed when the folder grows beyond max_bytes."""
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self, folder, max_bytes=1 << 30):
+        """Constructs the cache in the folder (created if needed)"""
+
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hashes = {}  # File hashes by (path, size, mtime), so unchanged files are only hashed once per session
+        os.makedirs(folder, exist_ok=True)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def fileHash(self, filename):
+        """Hash of the data file, remembered while the file size and modification time are unchanged"""
+
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+        if key not in self.hashes:
+            self.hashes[key] = fileHash(filename)
+        return self.hashes[key]
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def key(self, well, analysis, dwindow, window='index'):
+        """Key of the results of the analysis of the well with the derivative window. Wells given as arrays, or with
+        samples appended since loading, are keyed by their data rather than by the file."""
+
+        if well.filename is None or getattr(well, 'buffers', None) is not None:  # E.g. a segment, or a live falloff
+            source = hashlib.sha256(np.ascontiguousarray(well.data).tobytes()).hexdigest()
+        else:
+            source = self.fileHash(well.filename)
+        params = dict(file=source, samples=np.shape(well.data)[1], t_col=well.t_col, p_col=well.p_col,
+                      r_col=well.r_col, tp=well.tp, skip_rows=well.skip_rows, dwindow=dwindow,
+                      method=type(analysis).__name__)
+        if window != 'index':
+            params['window'] = window
+        if getattr(well, 'resampling', None) is not None:
+            params['resampling'] = list(well.resampling)
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def load(self, well, analysis, dwindow, window='index'):
+        """Restores the cached arrays and closure picks into the analysis. Returns False if not in the cache."""
+
+        path = os.path.join(self.folder, self.key(well, analysis, dwindow, window) + '.npz')
+        try:
+            with np.load(path) as entry:
+                state = {name: entry[name] for name in entry.files}
+            os.utime(path)  # Marks the entry as recently used
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return False
+        analysis.setState(state)
+        return True
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def save(self, well, analysis, dwindow, window='index'):
+        """Saves the arrays and closure picks of the analysis, then evicts old entries if the cache is too large"""
+
+        path = os.path.join(self.folder, self.key(well, analysis, dwindow, window) + '.npz')
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.savez(f, **analysis.getState())
+        os.replace(tmp, path)
+        self.evict()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes"""
+
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # Removed by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+########################################################################################################################
@@ -0,0 +1,204 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+
+import io
+import time
+import zlib
+import sqlite3
+import numpy as np
+
+# Columns of the analyses table (besides id), the curves are a compressed npz blob
+COLUMNS = ('well', 'filename', 'file_hash', 'cycle', 'date', 'method', 'tp', 'dwindow', 'window', 'pClosure',
+           'tClosure', 'slope', 'residual', 'depth', 'gradient', 'curves')
+
+# Columns returned by queries, all but the curves
+QUERY_COLUMNS = ('id',) + COLUMNS[:-1]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    well TEXT NOT NULL,
+    filename TEXT,
+    file_hash TEXT,
+    cycle INTEGER,
+    date TEXT NOT NULL,
+    method TEXT NOT NULL,
+    tp REAL,
+    dwindow REAL,
+    window TEXT,
+    pClosure REAL,
+    tClosure REAL,
+    slope REAL,
+    residual REAL,
+    depth REAL,
+    gradient REAL,
+    curves BLOB
+);
+CREATE INDEX IF NOT EXISTS analyses_well ON analyses (well, date);
+CREATE INDEX IF NOT EXISTS analyses_date ON analyses (date);
+CREATE INDEX IF NOT EXISTS analyses_gradient ON analyses (gradient);
+CREATE INDEX IF NOT EXISTS analyses_file_hash ON analyses (file_hash);
+'''
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def packCurves(arrays):
+    """Compresses a dict of arrays (e.g. the state of an analysis) to a blob"""
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return zlib.compress(buffer.getvalue(), 6)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def unpackCurves(blob):
+    """Restores the dict of arrays compressed by packCurves"""
+
+    with np.load(io.BytesIO(zlib.decompress(blob))) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+def closureGradient(pClosure, depth):
+    """Closure gradient in psi/ft, None without a depth"""
+
+    if depth is None or pClosure is None or depth <= 0:
+        return None
+    return pClosure / depth
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class ResultStore:
+    """Local SQLite store of closure picks (one row per well, cycle and method) with optional compressed curves.
+    Rows are written in bulk within one transaction, and queries by well, date and closure gradient use indexes, so
+    they do not depend on the number of stored analyses nor need any data file."""
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self, filename):
+        """Opens (or creates) the store in the database file"""
+
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('PRAGMA journal_mode=WAL')  # Readers are not blocked while a batch is written
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def close(self):
+        """Closes the database"""
+
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def add(self, rows):
+        """Inserts rows (dicts with keys of COLUMNS, missing ones are NULL) in a single transaction. Returns the number
+        of rows inserted."""
+
+        sql = 'INSERT INTO analyses ({}) VALUES ({})'.format(', '.join(COLUMNS), ', '.join('?' * len(COLUMNS)))
+        values = [tuple(row.get(name) for name in COLUMNS) for row in rows]
+        with self.connection:
+            self.connection.executemany(sql, values)
+        return len(values)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def addWell(self, well, name=None, date=None, depth=None, curves=True, file_hash=None):
+        """Stores the closure picks of the G-function and square root time analyses of a computed well. The date
+        (ISO format, e.g. of the test) defaults to today and a depth [ft] gives the closure gradient. With curves, the
+        arrays of each analysis are stored compressed. Analyses without a pick are skipped. Returns the rows added."""
+
+        from ResultCache import fileHash
+        if file_hash is None and well.filename is not None:
+            file_hash = fileHash(well.filename)
+        rows = []
+        for method, analysis in (('G', well.GFunction), ('SRT', well.SquareRoot)):
+            if analysis.xClosure is None:
+                continue
+            rows.append(dict(well=name or well.filename, filename=well.filename, file_hash=file_hash, date=date,
+                             method=method, tp=float(well.tp), dwindow=float(analysis.dwindow),
+                             window=analysis.window, pClosure=float(analysis.pClosure),
+                             tClosure=float(analysis.tClosure),
+                             slope=None if analysis.closureSlope is None else float(analysis.closureSlope),
+                             residual=None if analysis.closureResidual is None else float(analysis.closureResidual),
+                             depth=depth, curves=packCurves(analysis.getState()) if curves else None))
+        return self.add(self.complete(rows))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def addResults(self, results):
+        """Stores the results of a batch run (see BatchAnalysis.analyzeWell), two rows per successful well. Returns
+        the rows added."""
+
+        rows = []
+        for result in results:
+            if result['status'] != 'ok':
+                continue
+            for method in ('G', 'SRT'):
+                rows.append(dict(well=result['well'], filename=result['filename'], file_hash=result.get('file_hash'),
+                                 cycle=result.get('cycle') or None, date=result.get('date'), method=method,
+                                 tp=result.get('tp'), dwindow=result.get('dwindow'), window=result.get('window'),
+                                 pClosure=result[method + '_pClosure'], tClosure=result[method + '_tClosure'],
+                                 slope=result.get(method + '_slope'), residual=result[method + '_residual'],
+                                 depth=result.get('depth'), curves=result.get(method + '_curves')))
+        return self.add(self.complete(rows))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @staticmethod
+    def complete(rows):
+        """Fills in the default date and the closure gradient of the rows"""
+
+        today = time.strftime('%Y-%m-%d')
+        for row in rows:
+            row['date'] = row.get('date') or today
+            row['gradient'] = closureGradient(row.get('pClosure'), row.get('depth'))
+        return rows
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def query(self, well=None, date_from=None, date_to=None, gradient_min=None, gradient_max=None, method=None,
+              limit=None):
+        """Returns the stored analyses (without curves) as dicts, ordered by date. Every given condition must hold:
+        well name, date range (inclusive, ISO strings), closure gradient range [psi/ft] and method ('G' or 'SRT')."""
+
+        conditions, values = [], []
+        for column, operator, value in (('well', '=', well), ('date', '>=', date_from), ('date', '<=', date_to),
+                                        ('gradient', '>=', gradient_min), ('gradient', '<=', gradient_max),
+                                        ('method', '=', method)):
+            if value is not None:
+                conditions.append('{} {} ?'.format(column, operator))
+                values.append(value)
+        sql = 'SELECT {} FROM analyses'.format(', '.join(QUERY_COLUMNS))
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY date, id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            values.append(int(limit))
+        return [dict(zip(QUERY_COLUMNS, row)) for row in self.connection.execute(sql, values)]
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def curves(self, analysis_id):
+        """Returns the stored arrays of an analysis as a dict, None if they were not stored"""
+
+        row = self.connection.execute('SELECT curves FROM analyses WHERE id = ?', (analysis_id,)).fetchone()
+        if row is None:
+            raise KeyError('No analysis with id {}'.format(analysis_id))
+        return None if row[0] is None else unpackCurves(row[0])
+
+########################################################################################################################
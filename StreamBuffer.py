@@ -0,0 +1,54 @@
+########################################################################################################################
+#                                                                                                                      #
+#                                 DIAGNOSTIC FRACTURE INJECTION TESTS ANALYSIS PROGRAM                                 #
+#                                                     Version 1.0                                                      #
+#                                Written for Python by : Fahd Siddiqui and Aqsa Qureshi                                #
+#                                 https://github.com/DrFahdSiddiqui/DFITAnalysis-Python            				       #
+#                                                                                                                      #
+# ==================================================================================================================== #
+# LICENSE: MOZILLA 2.0                                                                                                 #
+#   This Source Code Form is subject to the terms of the Mozilla Public License, v. 2.0.                               #
+#   If a copy of the MPL was not distributed with this # file, You can obtain one at http://mozilla.org/MPL/2.0/.      #
+########################################################################################################################
+
+########################################################################################################################
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+class StreamBuffer:
+    """Array that grows along its last axis with amortized constant cost per appended sample. The filled part is
+    available as a view, so arrays derived from it by slicing stay views as well."""
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def __init__(self, values):
+        """Constructs the buffer holding a copy of the initial values"""
+
+        values = np.asarray(values, dtype=float)
+        self.n = np.shape(values)[-1]  # Number of filled samples
+        self.buffer = np.empty(np.shape(values)[:-1] + (max(2 * self.n, 1024),))
+        self.buffer[..., :self.n] = values
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    @property
+    def view(self):
+        """Filled part of the buffer"""
+
+        return self.buffer[..., :self.n]
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def append(self, values):
+        """Appends the values at the end (doubling the capacity when full) and returns the view of the filled part"""
+
+        values = np.asarray(values, dtype=float)
+        k = np.shape(values)[-1]
+        if self.n + k > np.shape(self.buffer)[-1]:
+            grown = np.empty(np.shape(self.buffer)[:-1] + (max(2 * np.shape(self.buffer)[-1], self.n + k),))
+            grown[..., :self.n] = self.view
+            self.buffer = grown
+        self.buffer[..., self.n:self.n + k] = values
+        self.n += k
+        return self.view
+
+########################################################################################################################
@@ -16,12 +16,16 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from BCAnalysis import BCAnalysis
+from StreamBuffer import StreamBuffer
+from Decimation import plotDecimated
 
 
 # -------------------------------------------------------------------------------------------------------------------- #
 class SquareRoot(BCAnalysis):
     """Class inherits from Analysis and defines functions specific to G-Function analysis."""
 
+    arrays = ('St', 'dSt', 'StdSt')
+
     # ---------------------------------------------------------------------------------------------------------------- #
     def __init__(self):
         """Constructor instantiates the variables to be used"""
@@ -32,11 +36,33 @@ class SquareRoot(BCAnalysis):
         self.StdSt = None  # Pressure derivative wrt log of sqrt time
 
     # ---------------------------------------------------------------------------------------------------------------- #
-    def analysis(self, well, dwindow):
-        """Computes Square root time functions and derivative """
+    def analysis(self, well, dwindow, window='index'):
+        """Computes Square root time functions and derivative. Returns St, dp/dSt and St.dp/dSt. The derivative window
+        is dwindow points either side by default, or dwindow either side in St (window='x') or in ln(tD)
+        (window='log') for irregularly sampled data. The derivative is a stage of the profiler of the well."""
+        self.dwindow = dwindow
+        self.window = window
+        self.buffers = None
         self.St = np.sqrt(well.tD)
-        self.dSt = SquareRoot.smoothDerivative(self.St, well.p_shut, dwindow)
+        with well.profiler.stage('SquareRoot.derivative', p_shut=np.size(well.p_shut)):
+            self.dSt = super().derivative(self.St, well.p_shut, well.tD)
         self.StdSt = self.St * self.dSt
+        return self.St, self.dSt, self.StdSt
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def update(self, well):
+        """Extends square root time functions and derivative to the samples appended to the well, only the derivative
+        windows touched by the new samples are recomputed"""
+
+        nOld = np.shape(self.St)[0]
+        if self.buffers is None:
+            self.buffers = StreamBuffer(self.St), StreamBuffer(self.dSt), StreamBuffer(self.StdSt)
+        tD = well.tD[nOld:]
+        self.St = self.buffers[0].append(np.sqrt(tD))
+        self.dSt = self.buffers[1].append(np.zeros_like(tD))
+        self.StdSt = self.buffers[2].append(np.zeros_like(tD))
+        lo = super().extendDerivative(self.St, well.p_shut, self.dSt, nOld, well.tD)
+        self.StdSt[lo:] = self.St[lo:] * self.dSt[lo:]
 
     # ---------------------------------------------------------------------------------------------------------------- #
     def plotData(self, well, xmin, xmax, y1min, y1max, y2min, y2max, y3min, y3max):
@@ -47,11 +73,12 @@ class SquareRoot(BCAnalysis):
         self.stLnPlot = None
         self.clsrPtPlot = None
 
-        self.pressPlot, = self.yaxis1.plot(self.St, well.p_shut, 'b-')
-        self.logDerPlot, = self.yaxis2.plot(self.St, self.StdSt, 'r-')
-        self.derPlot, = self.yaxis3.plot(self.St, self.dSt, 'g-')
+        self.pressPlot = plotDecimated(self.yaxis1, self.St, well.p_shut, 'b-')
+        self.logDerPlot = plotDecimated(self.yaxis2, self.St, self.StdSt, 'r-')
+        self.derPlot = plotDecimated(self.yaxis3, self.St, self.dSt, 'g-')
 
-        self.fig.canvas.set_window_title('SquareRoot')
+        if self.fig.canvas.manager is not None:  # No window without a gui backend
+            self.fig.canvas.manager.set_window_title('SquareRoot')
         self.fig.suptitle('Square Root Time Plot')
         self.yaxis1.set_xlabel('$t_D^{0.5}$')
         self.yaxis1.set_ylabel('Pressure [psi]')
@@ -72,14 +99,50 @@ class SquareRoot(BCAnalysis):
         to console"""
 
         super().identifyClosure(well)
-        self.tClosure = (self.xClosure**2 * well.tp)/3600
-        # TODO: Implement piecewise interpolation to get closure pressure
-        idx = np.argmin(np.abs(self.St - self.xClosure))
-        self.pClosure = well.p_shut[idx]
+        self.closure(well)
 
         super().annotateClosure()
         print('Square Root Time Analysis Results')
         print('Closure Pressure = {pc:.1f} psi '.format(pc=self.pClosure))
         print('Closure Time (after s/i) = {tc:.2f} hrs '.format(tc=self.tClosure))
 
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def autoIdentifyClosure(self, well, verbose=True):
+        """Identifies closure without user input from the departure of St.dp/dSt from the straight line through origin.
+        Annotates the figure if there is one and prints closure pressure and time to console"""
+
+        super().autoIdentifyClosure(self.St, self.StdSt)
+        self.closure(well)
+        if self.fig is not None:
+            super().annotateClosure()
+        if verbose:
+            print('Square Root Time Analysis Results (automatic)')
+            print('Closure Pressure = {pc:.1f} psi '.format(pc=self.pClosure))
+            print('Closure Time (after s/i) = {tc:.2f} hrs '.format(tc=self.tClosure))
+            print('Relative residual of line through origin = {res:.3f} '.format(res=self.closureResidual))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def closure(self, well):
+        """Computes closure pressure and time from the closure point on the square root time scale"""
+
+        self.pClosure, self.tClosure = self.closureAt(well, self.xClosure)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def closureAt(self, well, xClosure):
+        """Returns closure pressure and time for a closure point on the square root time scale"""
+
+        tClosure = (xClosure**2 * well.tp)/3600
+        # Pressure interpolated between the raw shut-in samples either side of the closure time, O(log n)
+        return super().interpolateSorted(well.tD_raw, well.p_shut_raw, xClosure**2), tClosure
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    def sweep(self, well, dwindows):
+        """Picks closure automatically for each of the derivative windows, with the derivatives of all windows read
+        from one set of block sums (see sweepDerivative). Returns the picks per window and the spread of closure
+        pressure and time."""
+
+        if self.St is None:
+            self.St = np.sqrt(well.tD)
+        return super().sweepClosure(well, self.St, well.p_shut, dwindows)
+
 ########################################################################################################################